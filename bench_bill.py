@@ -0,0 +1,196 @@
+"""
+Micro-benchmarks for the split, settlement and export hot paths
+
+    python bench_bill.py                      # run and compare with bench_baseline.json
+    python bench_bill.py --save-baseline      # run and store the results as the new baseline
+    python bench_bill.py --sizes 4x7 20x50    # people x items, default 4x7 20x50 200x1000
+
+Time is the best, median and interquartile spread of --repeat runs; peak memory comes from one extra run under tracemalloc
+A case is flagged when its memory, or its median time, exceeds the baseline by more than --threshold
+Time is only flagged for cases over --min-ms whose slowdown is larger than the runs' spread
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import streamlit_bill
+from excel_writer import create_excel
+from settlement import calculate_optimal_settlement, calculate_settlement_transactions
+
+DEFAULT_SIZES = ("4x7", "20x50", "200x1000")
+DEFAULT_REPEAT = 9
+LARGE_REPEAT = 3  # timed runs for sizes with 10k+ cells
+NOISE_IQRS = 2  # a slowdown within this many interquartile spreads counts as noise
+MIN_RUNS = 3  # fewer timed runs have no spread to judge noise by, so they are never flagged on time
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+
+
+def _uncached(func):
+    # The memoized wrappers would turn every repeat after the first into a cache hit
+    return getattr(func, "__wrapped__", func)
+
+
+def make_bill(n_people, n_items, seed=0):
+    """
+    Deterministic random bill: prices, integer weights (some zero), payments that cover the total
+    """
+    rng = np.random.default_rng(seed)
+    people = [f"person{i}" for i in range(n_people)]
+    items = [f"item{j}" for j in range(n_items)]
+    final_prices = np.round(rng.uniform(10, 2000, n_items), 2).tolist()
+    weights = (rng.integers(0, 3, (n_items, n_people)) * (rng.random((n_items, n_people)) < 0.7)).tolist()
+    paid = np.zeros(n_people)
+    payers = rng.choice(n_people, size=max(1, n_people // 4), replace=False)
+    paid[payers] = rng.dirichlet(np.ones(len(payers))) * sum(final_prices)
+    return people, items, final_prices, weights, np.round(paid, 2).tolist()
+
+
+def bench_cases(people, items, final_prices, weights, paid_amounts):
+    """
+    (name, callable) for every hot path, with inputs prepared the way main() prepares them
+    """
+    split = _uncached(streamlit_bill.calculate_bill_split)(people, items, final_prices, weights)
+    person_totals = [sum(split[person]) for person in people]
+    total_bill = sum(final_prices)
+    transactions = calculate_settlement_transactions(people, paid_amounts, person_totals)
+    export_weights = pd.DataFrame({
+        'Person': people,
+        **{item: weights[i] for i, item in enumerate(items)}
+    })
+
+    return [
+        ("calculate_bill_split", lambda: _uncached(streamlit_bill.calculate_bill_split)(
+            people, items, final_prices, weights)),
+        ("calculate_bill_split[paise]", lambda: _uncached(streamlit_bill.calculate_bill_split)(
+            people, items, final_prices, weights, mode="paise")),
+        ("calculate_settlement_transactions", lambda: calculate_settlement_transactions(
+            people, paid_amounts, person_totals)),
+        ("calculate_optimal_settlement", lambda: calculate_optimal_settlement(
+            people, paid_amounts, person_totals)),
+        ("generate_detailed_export", lambda: _uncached(streamlit_bill.generate_detailed_export)(
+            items, final_prices, people, person_totals, paid_amounts,
+            transactions, total_bill, export_weights, weights)),
+        ("generate_csv_export", lambda: _uncached(streamlit_bill.generate_csv_export)(
+            items, final_prices, people, person_totals, paid_amounts, export_weights)),
+        ("create_excel", lambda: create_excel(people, items)),
+    ]
+
+
+def measure(func, repeat):
+    """
+    Best, median and interquartile spread of wall time over repeat runs, then peak traced memory of one more run
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    q1, median, q3 = np.percentile(times, [25, 50, 75])
+    return {"seconds": min(times), "median_seconds": float(median), "iqr_seconds": float(q3 - q1),
+            "runs": len(times), "peak_bytes": peak}
+
+
+def run(sizes, repeat=DEFAULT_REPEAT, only=None, log=print):
+    """
+    Run every case at every size; returns {"<size>/<case>": measurement}
+    Sizes with 10k+ cells get LARGE_REPEAT timed runs
+    """
+    results = {}
+    for size in sizes:
+        n_people, n_items = (int(part) for part in size.lower().split("x"))
+        bill = make_bill(n_people, n_items)
+        runs = repeat if n_people * n_items < 10000 else min(repeat, LARGE_REPEAT)
+        for name, func in bench_cases(*bill):
+            if only and not any(pattern in name for pattern in only):
+                continue
+            key = f"{size}/{name}"
+            results[key] = measure(func, runs)
+            log(f"{key:<50} {results[key]['seconds'] * 1000:>10.2f} ms  "
+                f"{results[key]['peak_bytes'] / 1024:>10.1f} KB peak")
+    return results
+
+
+def compare(results, baseline, threshold=1.25, min_seconds=0.01, log=print):
+    """
+    Flag cases slower or hungrier than threshold x baseline; returns the flagged keys
+    Time is compared on medians, and only flagged when the slowdown is also larger than
+    NOISE_IQRS x the wider of the two runs' interquartile spreads, the case takes min_seconds or more
+    and it had at least MIN_RUNS timed runs
+    """
+    flagged = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        seconds = result.get("median_seconds", result["seconds"])
+        base_seconds = base.get("median_seconds", base["seconds"])
+        time_ratio = seconds / base_seconds if base_seconds else 1.0
+        memory_ratio = result["peak_bytes"] / base["peak_bytes"] if base["peak_bytes"] else 1.0
+        noise = NOISE_IQRS * max(result.get("iqr_seconds", 0.0), base.get("iqr_seconds", 0.0))
+        slower = (time_ratio > threshold and max(seconds, base_seconds) >= min_seconds
+                  and seconds - base_seconds > noise and result.get("runs", MIN_RUNS) >= MIN_RUNS)
+        hungrier = memory_ratio > threshold
+        mark = "REGRESSION" if slower or hungrier else "ok"
+        if slower or hungrier:
+            flagged.append(key)
+        log(f"{key:<50} time x{time_ratio:5.2f}  memory x{memory_ratio:5.2f}  {mark}")
+    return flagged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the bill split hot paths")
+    parser.add_argument("--sizes", nargs="+", default=list(DEFAULT_SIZES), help="people x items, e.g. 20x50")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per case; fewer than 3 are never flagged on time")
+    parser.add_argument("--only", nargs="+", help="run only cases whose name contains one of these")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="ratio over baseline that counts as a regression")
+    parser.add_argument("--min-ms", type=float, default=10.0, help="cases faster than this are not flagged on time")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.only)
+
+    if args.save_baseline:
+        stored = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as file:
+                stored = json.load(file).get("results", {})
+        stored.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump({
+                "python": sys.version.split()[0],
+                "machine": platform.platform(),
+                "numpy": np.__version__,
+                "pandas": pd.__version__,
+                "results": stored,
+            }, file, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 0
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)["results"]
+    print()
+    flagged = compare(results, baseline, args.threshold, args.min_ms / 1000)
+    print(f"\n{len(flagged)} regression(s)" if flagged else "\nNo regressions")
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+import contextlib
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from bill_engine import as_price_vector, as_weight_matrix
+
+# One Arrow IPC file per append (a segment), one row per bill; weights are flattened items x people
+SCHEMA = pa.schema([
+    ("bill_id", pa.string()),
+    ("name", pa.string()),
+    ("created", pa.timestamp("s")),
+    ("people", pa.list_(pa.string())),
+    ("items", pa.list_(pa.string())),
+    ("prices", pa.list_(pa.float64())),
+    ("weights", pa.list_(pa.float64())),
+    ("paid", pa.list_(pa.float64())),
+    ("settle_from", pa.list_(pa.string())),
+    ("settle_to", pa.list_(pa.string())),
+    ("settle_amount", pa.list_(pa.float64())),
+])
+INDEX_FILE = "index.json"
+LOCK_FILE = "index.lock"
+LOCK_TIMEOUT = 10  # seconds to wait for another writer
+LOCK_STALE = 60  # a lock file from another machine older than this was left by a writer that died
+# Columns the index is built from when a segment is missing from it
+INDEX_COLUMNS = ["bill_id", "name", "created", "people", "items", "prices"]
+
+
+def _bill_row(bill):
+    people, items = list(bill["people"]), list(bill["items"])
+    prices = as_price_vector(bill["final_prices"], len(items))
+    weights = as_weight_matrix(bill["weights"], len(items), len(people))
+    paid = bill.get("paid_amounts")
+    paid = np.zeros(len(people)) if paid is None else as_price_vector(paid, len(people))
+    transactions = bill.get("transactions") or []
+    return {
+        "bill_id": bill.get("bill_id") or uuid.uuid4().hex,
+        "name": bill.get("name") or "",
+        "created": pd.Timestamp(bill.get("created") or pd.Timestamp.now()).floor("s").to_pydatetime(),
+        "people": people,
+        "items": items,
+        "prices": prices.tolist(),
+        "weights": weights.ravel().tolist(),
+        "paid": paid.tolist(),
+        "settle_from": [str(t[0]) for t in transactions],
+        "settle_to": [str(t[1]) for t in transactions],
+        "settle_amount": [float(t[2]) for t in transactions],
+    }
+
+
+def _read_bill(table, row):
+    """
+    One archived bill as the dict main() and calculate_bill_split work with
+    """
+    record = {name: table.column(name)[row].as_py() for name in table.column_names}
+    people, items = record["people"], record["items"]
+    weights = np.asarray(record["weights"], dtype=float).reshape(len(items), len(people))
+    return {
+        "bill_id": record["bill_id"],
+        "name": record["name"],
+        "created": record["created"],
+        "people": people,
+        "items": items,
+        "final_prices": record["prices"],
+        "weights": weights.tolist(),
+        "paid_amounts": record["paid"],
+        "transactions": list(zip(record["settle_from"], record["settle_to"], record["settle_amount"])),
+    }
+
+
+def _index_entry(segment, row, record):
+    return {
+        "segment": segment,
+        "row": row,
+        "name": record["name"],
+        "created": record["created"].isoformat(),
+        "people": len(record["people"]),
+        "items": len(record["items"]),
+        "total": float(sum(record["prices"])),
+    }
+
+
+def _read_lock(lock_path):
+    try:
+        with open(lock_path, encoding="utf-8") as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def _lock_is_stale(owner, age):
+    """
+    A lock is stale when its process on this machine is gone, or, from another machine, when older than LOCK_STALE
+    A live writer keeps its lock however long it takes
+    """
+    host, _, rest = owner.partition(" ")
+    pid = rest.partition(" ")[0]
+    if host != socket.gethostname() or not pid.isdigit() or os.name == "nt":
+        return age > LOCK_STALE
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+def _break_stale_lock(lock_path):
+    """
+    Remove lock_path if it is stale; True if the caller should retry at once
+    """
+    try:
+        age = time.time() - os.path.getmtime(lock_path)
+    except FileNotFoundError:
+        return True
+    owner = _read_lock(lock_path)
+    if owner is None:
+        return True
+    # A writer that has created the file but not yet written its name gets a moment to do so
+    if not owner and age < 1:
+        return False
+    if owner and not _lock_is_stale(owner, age):
+        return False
+    # Re-check just before removing, so a lock taken since is left alone
+    if _read_lock(lock_path) == owner:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(lock_path)
+    return True
+
+
+class BillArchive:
+    """
+    Directory of Arrow segments plus a JSON index of every bill (id, name, date, size, total)
+    Segments are opened memory-mapped, so loading or scanning reads only the pages it touches
+    Several archives (sessions, processes) may share a directory: segments are never rewritten,
+    and the index is merged under a lock file and re-read whenever another writer changed it
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._index_stamp = None
+        self.index = {"segments": [], "bills": {}}
+        self._refresh()
+
+    def _index_path(self):
+        return os.path.join(self.path, INDEX_FILE)
+
+    def _read_index(self):
+        try:
+            with open(self._index_path(), encoding="utf-8") as file:
+                index = json.load(file)
+        except FileNotFoundError:
+            index = {"segments": [], "bills": {}}
+        # Segments written by a writer that died before updating the index are picked up here
+        known = set(index["segments"])
+        for segment in sorted(os.listdir(self.path)):
+            if segment.startswith("bills-") and segment.endswith(".arrow") and segment not in known:
+                table = self._open_segment(segment).select(INDEX_COLUMNS)
+                for row, record in enumerate(table.to_pylist()):
+                    index["bills"][record["bill_id"]] = _index_entry(segment, row, record)
+                index["segments"].append(segment)
+        return index
+
+    def _write_index(self, index):
+        index_path = self._index_path()
+        with open(index_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(index, file)
+        os.replace(index_path + ".tmp", index_path)
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self._index_path())
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _refresh(self):
+        # Re-read the index only when another writer has replaced it
+        stamp = self._stamp()
+        if stamp is None or stamp != self._index_stamp:
+            self.index = self._read_index()
+            self._index_stamp = stamp
+        return self.index
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """
+        Hold the directory's writer lock: an O_EXCL lock file naming its owner, so it works across processes
+        """
+        lock_path = os.path.join(self.path, LOCK_FILE)
+        token = f"{socket.gethostname()} {os.getpid()} {uuid.uuid4().hex}"
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        with self._lock:
+            while True:
+                try:
+                    fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                except FileExistsError:
+                    if _break_stale_lock(lock_path):
+                        continue
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"{lock_path} is held by another writer")
+                    time.sleep(0.01)
+                    continue
+                with os.fdopen(fd, "w", encoding="utf-8") as file:
+                    file.write(token)
+                break
+            try:
+                yield
+            finally:
+                # Only remove the lock if it is still ours
+                if _read_lock(lock_path) == token:
+                    os.remove(lock_path)
+
+    def _open_segment(self, segment):
+        source = pa.memory_map(os.path.join(self.path, segment), "r")
+        return pa.ipc.open_file(source).read_all()
+
+    def append(self, bills):
+        """
+        Store bills (dicts with people, items, final_prices, weights, optional paid_amounts,
+        transactions, name, created) as one new segment; returns their bill IDs
+        """
+        rows = [_bill_row(bill) for bill in bills]
+        if not rows:
+            return []
+        table = pa.Table.from_pylist(rows, schema=SCHEMA)
+
+        # The segment is written under a temporary name, so readers never see half of it
+        segment = f"bills-{time.time_ns()}-{uuid.uuid4().hex[:8]}.arrow"
+        segment_path = os.path.join(self.path, segment)
+        with pa.OSFile(segment_path + ".tmp", "wb") as sink:
+            with pa.ipc.new_file(sink, SCHEMA) as writer:
+                writer.write_table(table)
+
+        try:
+            with self._locked():
+                os.replace(segment_path + ".tmp", segment_path)
+                # Merge into the index as it is on disk now, not as this instance last saw it
+                index = self._read_index()
+                if segment not in index["segments"]:
+                    index["segments"].append(segment)
+                for row, record in enumerate(rows):
+                    index["bills"][record["bill_id"]] = _index_entry(segment, row, record)
+                self._write_index(index)
+                self.index, self._index_stamp = index, self._stamp()
+        except TimeoutError:
+            os.remove(segment_path + ".tmp")
+            raise
+        return [record["bill_id"] for record in rows]
+
+    def __len__(self):
+        return len(self._refresh()["bills"])
+
+    def __contains__(self, bill_id):
+        return bill_id in self._refresh()["bills"]
+
+    def listing(self):
+        """
+        The index as a DataFrame, newest first, without opening any segment
+        """
+        listing = pd.DataFrame.from_dict(self._refresh()["bills"], orient="index")
+        if listing.empty:
+            return listing
+        return listing.drop(columns=["segment", "row"]).rename_axis("bill_id").sort_values("created", ascending=False)
+
+    def load(self, bill_id):
+        entry = self._refresh()["bills"].get(bill_id)
+        if entry is None:
+            raise KeyError(f"No bill {bill_id} in {self.path}")
+        return _read_bill(self._open_segment(entry["segment"]), entry["row"])
+
+    def scan(self, columns=None):
+        """
+        Yield each segment as a memory-mapped Arrow table, optionally only some columns
+        """
+        for segment in list(self._refresh()["segments"]):
+            table = self._open_segment(segment)
+            yield table.select(columns) if columns else table
+
+    def __iter__(self):
+        for table in self.scan():
+            for row in range(table.num_rows):
+                yield _read_bill(table, row)
+
+
+def matrix_frame(bill):
+    """
+    The bill as main()'s data_editor matrix: Item, Price (₹), then one weight column per person
+    """
+    data = {"Item": bill["items"], "Price (₹)": list(bill["final_prices"])}
+    weights = as_weight_matrix(bill["weights"], len(bill["items"]), len(bill["people"]))
+    for person_idx, person in enumerate(bill["people"]):
+        data[person] = weights[:, person_idx].tolist()
+    return pd.DataFrame(data)
@@ -0,0 +1,166 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+# Caches live here, keyed by function name, so they survive Streamlit re-running the main script
+_registry = {}
+_registry_lock = threading.Lock()
+
+# Hashed by repr, which is exact for these
+_SCALARS = (bool, int, float, complex, str, bytes, np.generic, pd.Timestamp, pd.Timedelta)
+
+
+def _feed(digest, value):
+    """
+    Feed a value into the hash by content (arrays and DataFrames by their data, not identity)
+    """
+    if value is None or isinstance(value, _SCALARS):
+        digest.update(f"{type(value).__name__}:{value!r};".encode())
+    elif isinstance(value, np.ndarray):
+        digest.update(f"nd{value.dtype.str}{value.shape}".encode())
+        if value.dtype.hasobject:
+            # Object arrays hold pointers, so hash their elements instead
+            _feed(digest, value.ravel().tolist())
+        else:
+            digest.update(np.ascontiguousarray(value).tobytes())
+    elif hasattr(value, "tocoo"):
+        # scipy.sparse matrices hash by their entries, not their repr
+        coo = value.tocoo()
+        digest.update(f"sp{coo.shape}".encode())
+        for part in (coo.row, coo.col, coo.data):
+            _feed(digest, np.asarray(part))
+    elif isinstance(value, pd.DataFrame):
+        digest.update(f"df{list(value.columns)!r}".encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).values.tobytes())
+    elif isinstance(value, (pd.Series, pd.Index)):
+        # Their repr is truncated past 60 rows, so hash every value
+        digest.update(f"{type(value).__name__}{value.dtype}{value.name!r}{len(value)}".encode())
+        digest.update(pd.util.hash_pandas_object(value, index=isinstance(value, pd.Series)).values.tobytes())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}{len(value)}(".encode())
+        for item in value:
+            _feed(digest, item)
+        digest.update(b")")
+    elif isinstance(value, dict):
+        digest.update(f"dict{len(value)}(".encode())
+        for key in sorted(value, key=repr):
+            _feed(digest, key)
+            _feed(digest, value[key])
+        digest.update(b")")
+    else:
+        # A repr can be truncated or identity-based, so unknown types are refused rather than guessed at
+        raise TypeError(f"Cannot content-hash a {type(value).__name__}")
+
+
+def content_hash(*args, **kwargs):
+    """
+    Stable content hash of call arguments
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    _feed(digest, args)
+    _feed(digest, kwargs)
+    return digest.hexdigest()
+
+
+class MemoCache:
+    """
+    Thread-safe LRU store with a time-to-live and hit/miss counters
+    """
+
+    def __init__(self, maxsize=128, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
+
+
+def memoize(maxsize=128, ttl=600, name=None):
+    """
+    Cache a function's results by the content hash of its arguments
+    Calls whose arguments cannot be content-hashed run uncached
+    The wrapped function gets .cache (the MemoCache) for stats and clearing
+    """
+    def decorator(func):
+        cache_name = name or func.__name__
+        with _registry_lock:
+            cache = _registry.get(cache_name)
+            if cache is None:
+                cache = _registry[cache_name] = MemoCache(maxsize, ttl)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                key = content_hash(*args, **kwargs)
+            except TypeError:
+                # Arguments we cannot hash by content are never cached, just computed
+                return func(*args, **kwargs)
+            found, value = cache.get(key)
+            if found:
+                return value
+            value = func(*args, **kwargs)
+            cache.put(key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    """
+    Hit/miss counters for every memoized function
+    """
+    with _registry_lock:
+        caches = dict(_registry)
+    return {cache_name: cache.stats() for cache_name, cache in caches.items()}
+
+
+def clear_caches():
+    with _registry_lock:
+        caches = list(_registry.values())
+    for cache in caches:
+        cache.clear()
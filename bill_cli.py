@@ -0,0 +1,232 @@
+"""
+Generate bill split workbooks in bulk, without Streamlit
+
+    python bill_cli.py bills.csv --out Bills
+    python bill_cli.py bills.jsonl --zip bills.zip --processes 8
+    python bill_cli.py bills.jsonl --archive Archive    # also keep the priced bills in a BillArchive
+    python bill_cli.py Archive --out Bills              # rebuild workbooks for every archived bill
+
+Manifest: one bill per CSV row or JSONL line with
+    name           file name (".xlsx" is added)
+    people, items  comma-separated names, or lists in JSONL
+    final_prices, paid_amounts, weights   optional; fill in the sheet
+CSV cells hold final_prices/paid_amounts comma-separated and weights as JSON (items x people)
+A directory in place of the manifest is read as a bill archive (see bill_archive.py)
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from bill_archive import BillArchive
+from excel_writer import FORMULA_MODES, VALUE_MODES, WRITERS, excel_bytes
+
+
+def _names(value):
+    if isinstance(value, str):
+        return [name.strip() for name in value.split(",") if name.strip()]
+    return [str(name).strip() for name in value]
+
+
+def _numbers(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        return [float(number) for number in value.split(",") if number.strip()]
+    return [float(number) for number in value]
+
+
+def _weights(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    return value
+
+
+def parse_record(record, line):
+    """
+    Turn one manifest record into a bill dict
+    """
+    if not record.get("people") or not record.get("items"):
+        raise ValueError(f"Manifest record {line} needs people and items")
+    name = os.path.basename(str(record.get("name") or f"bill_{line}"))
+    if name.lower().endswith(".xlsx"):
+        name = name[:-5]
+    return {
+        "name": name,
+        "people": _names(record["people"]),
+        "items": _names(record["items"]),
+        "final_prices": _numbers(record.get("final_prices")),
+        "paid_amounts": _numbers(record.get("paid_amounts")),
+        "weights": _weights(record.get("weights")),
+    }
+
+
+def _records(file, jsonl):
+    # (record number, record or the error reading it); JSONL records are numbered by line
+    if jsonl:
+        for line, text in enumerate(file, start=1):
+            if text.strip():
+                try:
+                    yield line, json.loads(text)
+                except ValueError as e:
+                    yield line, e
+    else:
+        yield from enumerate(csv.DictReader(file), start=1)
+
+
+def read_manifest(path, log=print):
+    """
+    Read bills from a .csv or .jsonl manifest; names are made unique
+    A record that cannot be parsed is logged and skipped
+    Returns (bills, number of records skipped)
+    """
+    bills, failed = [], 0
+    with open(path, newline="", encoding="utf-8") as file:
+        for line, record in _records(file, path.lower().endswith((".jsonl", ".ndjson"))):
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                bill = parse_record(record, line)
+            except (ValueError, TypeError, AttributeError) as e:
+                failed += 1
+                log(f"FAILED  record {line}: {e}")
+                continue
+            bills.append(bill)
+    return _unique_names(bills), failed
+
+
+def read_archive(path):
+    """
+    Every bill in a BillArchive directory, oldest first, as manifest bills
+    """
+    bills = [
+        {
+            "name": os.path.basename(bill["name"] or bill["bill_id"]),
+            "people": bill["people"],
+            "items": bill["items"],
+            "final_prices": bill["final_prices"],
+            "paid_amounts": bill["paid_amounts"],
+            "weights": bill["weights"],
+        }
+        for bill in BillArchive(path)
+    ]
+    return _unique_names(bills)
+
+
+def _unique_names(bills):
+    seen = {}
+    for bill in bills:
+        count = seen.get(bill["name"], 0)
+        seen[bill["name"]] = count + 1
+        if count:
+            bill["name"] = f"{bill['name']}_{count + 1}"
+    return bills
+
+
+def build_bill(bill, options, out_dir=None):
+    """
+    Worker: build one workbook; writes it to out_dir, or returns the bytes for the zip
+    Returns (name, bytes or None, size, seconds)
+    """
+    start = time.perf_counter()
+    kwargs = dict(options)
+    if bill["final_prices"] is not None and bill["weights"] is not None:
+        kwargs.update(
+            final_prices=bill["final_prices"],
+            weights=bill["weights"],
+            paid_amounts=bill["paid_amounts"],
+        )
+    elif kwargs.get("values") is not None:
+        kwargs["values"] = None
+    data = excel_bytes(bill["people"], bill["items"], **kwargs)
+
+    if out_dir is not None:
+        with open(os.path.join(out_dir, f"{bill['name']}.xlsx"), "wb") as file:
+            file.write(data)
+        return bill["name"], None, len(data), time.perf_counter() - start
+    return bill["name"], data, len(data), time.perf_counter() - start
+
+
+def run(bills, options, out_dir=None, zip_path=None, processes=None, failed=0, log=print):
+    """
+    Build every bill across a process pool and report per-bill and total timing
+    With zip_path the files are added to one zip as they finish, otherwise written to out_dir
+    failed counts bills already lost before the run (skipped manifest records)
+    Returns the number of bills that failed
+    """
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    archive = zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) if zip_path else None
+    skipped = failed
+    start = time.perf_counter()
+    busy = 0.0
+
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {
+                pool.submit(build_bill, bill, options, None if archive else out_dir): bill
+                for bill in bills
+            }
+            for future in as_completed(futures):
+                bill = futures[future]
+                try:
+                    name, data, size, seconds = future.result()
+                except Exception as e:
+                    failed += 1
+                    log(f"FAILED  {bill['name']}: {e}")
+                    continue
+                if archive is not None:
+                    archive.writestr(f"{name}.xlsx", data)
+                busy += seconds
+                log(f"{name}.xlsx  {len(bill['people'])} people x {len(bill['items'])} items"
+                    f"  {seconds:.3f}s  {size / 1024:.1f} KB")
+    finally:
+        if archive is not None:
+            archive.close()
+
+    total = time.perf_counter() - start
+    done = len(bills) - (failed - skipped)
+    log(f"{done} workbooks in {total:.2f}s ({done / total if total else 0:.1f}/s, "
+        f"{busy:.2f}s of work across processes), {failed} failed")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate bill split workbooks from a manifest")
+    parser.add_argument("manifest", help="CSV or JSONL file, one bill per record, or a bill archive directory")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--out", default="Bills", help="folder for individual .xlsx files (default: Bills)")
+    target.add_argument("--zip", help="write all workbooks into this zip instead")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--writer", choices=sorted(WRITERS), default="openpyxl")
+    parser.add_argument("--formulas", choices=FORMULA_MODES, default="cell")
+    parser.add_argument("--values", choices=[mode for mode in VALUE_MODES if mode], default=None,
+                        help="for bills with prices and weights: write results as values or cache them")
+    parser.add_argument("--archive", help="also append the bills that have prices and weights to this archive")
+    args = parser.parse_args(argv)
+
+    try:
+        if os.path.isdir(args.manifest):
+            bills, skipped = read_archive(args.manifest), 0
+        else:
+            bills, skipped = read_manifest(args.manifest)
+    except OSError as e:
+        parser.error(str(e))
+    if args.archive:
+        priced = [bill for bill in bills if bill["final_prices"] is not None and bill["weights"] is not None]
+        BillArchive(args.archive).append(priced)
+        print(f"{len(priced)} bills archived in {args.archive}")
+    options = {"writer": args.writer, "formulas": args.formulas, "values": args.values}
+    failed = run(bills, options, out_dir=None if args.zip else args.out,
+                 zip_path=args.zip, processes=args.processes, failed=skipped)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,484 @@
+import time
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+from settlement import calculate_settlement_transactions
+
+# Split matrix is items x people, same orientation as the weights matrix
+SplitResult = namedtuple("SplitResult", ["splits", "person_totals", "item_totals"])
+
+# Sparse weights (or split amounts) as COO: parallel item index, person index and value arrays
+# sorted item-major, with shape (items, people); only non-zero entries are stored
+SparseWeights = namedtuple("SparseWeights", ["items", "people", "values", "shape"])
+
+
+def as_price_vector(final_prices, n_items=None):
+    """
+    Convert a list of prices into a float price vector of length n_items
+    """
+    prices = np.asarray(final_prices, dtype=np.float64).ravel()
+    if n_items is not None and len(prices) != n_items:
+        padded = np.zeros(n_items, dtype=np.float64)
+        padded[:min(n_items, len(prices))] = prices[:n_items]
+        prices = padded
+    return prices
+
+
+def is_sparse(weights):
+    """
+    True for SparseWeights and for scipy.sparse matrices
+    """
+    return isinstance(weights, SparseWeights) or hasattr(weights, "tocoo")
+
+
+def as_sparse_weights(weights, n_items=None, n_people=None):
+    """
+    Convert weights to SparseWeights (COO, item-major, zeros dropped)
+    Accepts SparseWeights, a scipy.sparse matrix or dense weights
+    """
+    if isinstance(weights, SparseWeights):
+        items, people, values = weights.items, weights.people, weights.values
+        shape = weights.shape
+    elif hasattr(weights, "tocoo"):
+        coo = weights.tocoo()
+        items, people, values = coo.row, coo.col, coo.data
+        shape = coo.shape
+    else:
+        try:
+            # Rectangular input keeps its dtype, so integer weights stay integers
+            matrix = np.asarray(weights)
+        except ValueError:
+            matrix = None
+        if matrix is None or matrix.ndim != 2 or matrix.dtype == object:
+            n_rows = len(weights) if n_items is None else n_items
+            n_cols = max((len(row) for row in weights), default=0) if n_people is None else n_people
+            matrix = as_weight_matrix(weights, n_rows, n_cols)
+        items, people = np.nonzero(matrix)
+        values = matrix[items, people]
+        shape = matrix.shape
+
+    shape = (shape[0] if n_items is None else n_items, shape[1] if n_people is None else n_people)
+    items = np.asarray(items, dtype=np.intp)
+    people = np.asarray(people, dtype=np.intp)
+    values = np.asarray(values)
+    keep = (values != 0) & (items < shape[0]) & (people < shape[1])
+    order = np.lexsort((people[keep], items[keep]))
+    return SparseWeights(items[keep][order], people[keep][order], values[keep][order], shape)
+
+
+def values_at(matrix, entries):
+    """
+    Values of a dense or sparse items x people matrix at the entries of a SparseWeights
+    """
+    if not is_sparse(matrix):
+        return np.asarray(matrix)[entries.items, entries.people]
+    matrix = as_sparse_weights(matrix, *entries.shape)
+    n_people = entries.shape[1]
+    keys = matrix.items * n_people + matrix.people
+    wanted = entries.items * n_people + entries.people
+    values = np.zeros(len(wanted), dtype=matrix.values.dtype)
+    if len(keys):
+        positions = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        found = keys[positions] == wanted
+        values[found] = matrix.values[positions[found]]
+    return values
+
+
+def as_weight_matrix(weights, n_items, n_people):
+    """
+    Convert item x person weights (possibly ragged list of lists) into a dense float matrix
+    Missing entries are treated as weight 0, same as the old nested-loop split
+    Sparse weights are scattered into the dense matrix
+    """
+    if is_sparse(weights):
+        sparse = as_sparse_weights(weights, n_items, n_people)
+        matrix = np.zeros((n_items, n_people), dtype=np.float64)
+        matrix[sparse.items, sparse.people] = sparse.values
+        return matrix
+    if isinstance(weights, np.ndarray) and weights.shape == (n_items, n_people):
+        return weights.astype(np.float64, copy=False)
+
+    matrix = np.zeros((n_items, n_people), dtype=np.float64)
+    for item_idx, row in enumerate(weights[:n_items]):
+        row = np.asarray(row, dtype=np.float64).ravel()[:n_people]
+        matrix[item_idx, :len(row)] = row
+    return matrix
+
+
+def parse_bill_matrix(matrix_df, people_names, item_column="Item", price_column="Price (₹)", keep_blank=False):
+    """
+    Parse the rows=items, columns=people matrix with column operations
+    Blank or "nan" item names are dropped; bad or negative prices and weights become 0
+    Returns (items, prices, weights) with dense float arrays ready for the split engine
+    keep_blank=True keeps every row and uses None as the name of blank rows
+    """
+    names = matrix_df[item_column].astype(object)
+    names = names.where(names.notna(), "").astype(str).str.strip()
+    valid = ((names != "") & (names.str.lower() != "nan")).to_numpy()
+
+    prices = pd.to_numeric(matrix_df[price_column], errors="coerce").fillna(0).clip(lower=0).to_numpy(np.float64)
+    weights = (
+        matrix_df.reindex(columns=list(people_names))
+        .apply(pd.to_numeric, errors="coerce")
+        .fillna(0)
+        .clip(lower=0)
+        .to_numpy(np.float64)
+    )
+
+    if keep_blank:
+        items = [name if ok else None for name, ok in zip(names.tolist(), valid)]
+        return items, np.where(valid, prices, 0), weights * valid[:, None]
+    return names[valid].tolist(), prices[valid], weights[valid]
+
+
+def split_matrix(final_prices, weights):
+    """
+    Weighted split of every item in one broadcast
+    weights is an items x people array, final_prices has one entry per item
+    Leading batch dimensions are allowed: (bills, items, people) with (bills, items) prices
+    Items whose weights are all zero get a zero column instead of dividing by zero
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    prices = np.asarray(final_prices, dtype=np.float64)
+
+    # Normalise each item once: weight / total_weight
+    total_weights = weights.sum(axis=-1, keepdims=True)
+    shares = np.divide(weights, total_weights, out=np.zeros_like(weights), where=total_weights > 0)
+
+    return shares * prices[..., None]
+
+
+def to_paise(amounts):
+    """
+    Convert rupee amounts to int64 paise
+    """
+    return np.rint(np.asarray(amounts, dtype=np.float64) * 100).astype(np.int64)
+
+
+def from_paise(amounts):
+    """
+    Convert int64 paise back to rupees
+    """
+    return np.asarray(amounts, dtype=np.int64) / 100
+
+
+def split_matrix_paise(price_paise, weights):
+    """
+    Weighted split in integer paise using largest-remainder rounding
+    Every item row sums exactly to its price; leftover paise go to the largest fractional shares
+    Same shapes as split_matrix, leading batch dimensions included
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    price_paise = np.asarray(price_paise, dtype=np.int64)
+
+    total_weights = weights.sum(axis=-1, keepdims=True)
+    shares = np.divide(weights, total_weights, out=np.zeros_like(weights), where=total_weights > 0)
+    exact = shares * price_paise[..., None]
+
+    floors = np.floor(exact)
+    fractions = exact - floors
+    floors = floors.astype(np.int64)
+
+    # Paise still to hand out per item (zero for items nobody shares)
+    remainder = price_paise - floors.sum(axis=-1)
+    remainder = np.where(total_weights[..., 0] > 0, np.clip(remainder, 0, None), 0)
+
+    # Rank each share by fractional part, largest first; ties go to the earlier person
+    order = np.argsort(-fractions, axis=-1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(order.shape[-1]), axis=-1)
+
+    return floors + (ranks < remainder[..., None])
+
+
+def _split_tensors(prices, weights, mode):
+    """
+    Split padded tensors in the requested mode
+    """
+    if mode == "paise":
+        return split_matrix_paise(to_paise(prices), weights)
+    if mode == "float":
+        return split_matrix(prices, weights)
+    raise ValueError(f"Unknown split mode: {mode}")
+
+
+def split_sparse(final_prices, weights, mode="float"):
+    """
+    Weighted split on SparseWeights without ever building the dense matrix
+    Item totals are summed with bincount over the stored entries, so cost scales with non-zeros
+    Returns the split amounts as SparseWeights with the same entries as weights
+    mode="paise" uses the same largest-remainder rounding as split_matrix_paise
+    """
+    n_items = weights.shape[0]
+    values = np.asarray(weights.values, dtype=np.float64)
+    total_weights = np.bincount(weights.items, values, minlength=n_items)
+    shares = values / total_weights[weights.items]
+
+    if mode == "float":
+        prices = as_price_vector(final_prices, n_items)
+        return weights._replace(values=shares * prices[weights.items])
+    if mode != "paise":
+        raise ValueError(f"Unknown split mode: {mode}")
+
+    price_paise = to_paise(as_price_vector(final_prices, n_items))
+    exact = shares * price_paise[weights.items]
+    floors = np.floor(exact)
+    fractions = exact - floors
+    floors = floors.astype(np.int64)
+
+    remainder = price_paise - np.bincount(weights.items, floors, minlength=n_items)
+    remainder = np.where(total_weights > 0, np.clip(remainder, 0, None), 0)
+
+    # Rank within each item by fractional part, largest first; ties go to the earlier person
+    order = np.lexsort((weights.people, -fractions, weights.items))
+    starts = np.searchsorted(weights.items[order], weights.items[order], side="left")
+    ranks = np.empty(len(order), dtype=np.intp)
+    ranks[order] = np.arange(len(order)) - starts
+
+    return weights._replace(values=floors + (ranks < remainder[weights.items]))
+
+
+def compute_split(final_prices, weights, n_people=None, mode="float"):
+    """
+    Run the split engine and return the split matrix with per-person and per-item totals
+    mode="float" works in rupees, mode="paise" returns exact int64 paise
+    Sparse weights (SparseWeights or scipy.sparse) stay sparse: splits comes back as SparseWeights
+    and the totals are built with bincount
+    """
+    n_items = len(final_prices)
+    if is_sparse(weights):
+        sparse = as_sparse_weights(weights, n_items, n_people)
+        splits = split_sparse(final_prices, sparse, mode)
+        return SplitResult(
+            splits,
+            np.bincount(splits.people, splits.values, minlength=sparse.shape[1]).astype(splits.values.dtype),
+            np.bincount(splits.items, splits.values, minlength=n_items).astype(splits.values.dtype),
+        )
+
+    if n_people is None:
+        n_people = max((len(w) for w in weights), default=0)
+
+    prices = as_price_vector(final_prices, n_items)
+    matrix = as_weight_matrix(weights, n_items, n_people)
+    splits = _split_tensors(prices, matrix, mode)
+
+    return SplitResult(splits, splits.sum(axis=0), splits.sum(axis=1))
+
+
+# Batch results: one dict per bill plus timing for the whole call
+BatchResult = namedtuple("BatchResult", ["bills", "timings"])
+
+
+def _bill_fields(bill):
+    """
+    Accept a bill as a dict (final_prices, weights, people, paid_amounts) or a tuple in that order
+    """
+    if isinstance(bill, dict):
+        return bill["final_prices"], bill["weights"], bill.get("people"), bill.get("paid_amounts")
+    bill = tuple(bill) + (None, None)
+    return bill[0], bill[1], bill[2], bill[3]
+
+
+def _bill_shape(bill):
+    final_prices, weights, people, _ = _bill_fields(bill)
+    n_people = len(people) if people is not None else max((len(w) for w in weights), default=0)
+    return len(final_prices), n_people
+
+
+def pad_bills(bills):
+    """
+    Stack a ragged list of bills into padded tensors
+    Returns prices (B, I), weights (B, I, P) and the original (items, people) shape of each bill
+    """
+    shapes = [_bill_shape(bill) for bill in bills]
+
+    max_items = max((s[0] for s in shapes), default=0)
+    max_people = max((s[1] for s in shapes), default=0)
+
+    prices = np.zeros((len(bills), max_items), dtype=np.float64)
+    weights = np.zeros((len(bills), max_items, max_people), dtype=np.float64)
+    for bill_idx, bill in enumerate(bills):
+        final_prices, bill_weights, _, _ = _bill_fields(bill)
+        n_items, n_people = shapes[bill_idx]
+        prices[bill_idx, :n_items] = as_price_vector(final_prices, n_items)
+        weights[bill_idx, :n_items, :n_people] = as_weight_matrix(bill_weights, n_items, n_people)
+
+    return prices, weights, shapes
+
+
+# A chunk may pad out to PAD_SLACK x its bills' real cells (plus PAD_CELLS) before it is cut
+PAD_SLACK = 2
+PAD_CELLS = 4096
+
+
+def _shape_chunks(shapes, chunk_size):
+    """
+    Bill indices grouped for padding: sorted by size, so one large bill never pads a chunk of small ones
+    """
+    order = sorted(range(len(shapes)), key=lambda i: (shapes[i][1], shapes[i][0]))
+    chunks, chunk = [], []
+    real_cells = max_items = max_people = 0
+    for bill_idx in order:
+        n_items, n_people = shapes[bill_idx]
+        grown_items, grown_people = max(max_items, n_items), max(max_people, n_people)
+        padded_cells = (len(chunk) + 1) * grown_items * grown_people
+        if chunk and (len(chunk) >= chunk_size
+                      or padded_cells > PAD_SLACK * (real_cells + n_items * n_people) + PAD_CELLS):
+            chunks.append(chunk)
+            chunk, real_cells = [], 0
+            grown_items, grown_people = n_items, n_people
+        chunk.append(bill_idx)
+        real_cells += n_items * n_people
+        max_items, max_people = grown_items, grown_people
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _split_chunk(bills, mode="float"):
+    """
+    Split one chunk of ragged bills in a single vectorized pass (also the process-pool worker)
+    """
+    prices, weights, shapes = pad_bills(bills)
+    splits = _split_tensors(prices, weights, mode)
+    person_totals = splits.sum(axis=1)
+    item_totals = splits.sum(axis=2)
+
+    # Copies, so the padded chunk tensors are freed once the chunk is done
+    results = []
+    for bill_idx, (n_items, n_people) in enumerate(shapes):
+        results.append({
+            "splits": splits[bill_idx, :n_items, :n_people].copy(),
+            "person_totals": person_totals[bill_idx, :n_people].copy(),
+            "item_totals": item_totals[bill_idx, :n_items].copy(),
+        })
+    return results
+
+
+def _settle(bills, results, mode="float"):
+    """
+    Attach settlement transactions to every bill that has paid_amounts
+    """
+    for bill, result in zip(bills, results):
+        _, _, people, paid_amounts = _bill_fields(bill)
+        if paid_amounts is None:
+            continue
+        n_people = len(result["person_totals"])
+        if people is None:
+            people = [f"Person {i+1}" for i in range(n_people)]
+        person_totals = result["person_totals"]
+        if mode == "paise":
+            person_totals = from_paise(person_totals)
+        result["transactions"] = calculate_settlement_transactions(
+            people, list(paid_amounts), person_totals.tolist()
+        )
+
+
+def batch_split(bills=None, prices=None, weights=None, paid_amounts=None, processes=None, chunk_size=1000,
+                mode="float"):
+    """
+    Split many bills in one call
+    Pass either a ragged list of bills, or padded prices (B, I) and weights (B, I, P) tensors
+    processes > 1 spreads chunks of chunk_size bills over a process pool
+    mode="paise" returns int64 paise splits, as in compute_split
+    """
+    start = time.perf_counter()
+
+    if bills is None:
+        # Padded tensors: a single broadcast over the whole batch
+        splits = _split_tensors(prices, weights, mode)
+        results = [
+            {"splits": s, "person_totals": p, "item_totals": i}
+            for s, p, i in zip(splits, splits.sum(axis=1), splits.sum(axis=2))
+        ]
+        split_time = time.perf_counter() - start
+        if paid_amounts is not None:
+            bills = [{"final_prices": p, "weights": w, "paid_amounts": paid}
+                     for p, w, paid in zip(prices, weights, paid_amounts)]
+    else:
+        bills = list(bills)
+        chunk_indices = _shape_chunks([_bill_shape(bill) for bill in bills], chunk_size)
+        chunks = [[bills[i] for i in indices] for indices in chunk_indices]
+        if processes and processes > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                chunk_results = list(pool.map(partial(_split_chunk, mode=mode), chunks))
+        else:
+            chunk_results = [_split_chunk(chunk, mode) for chunk in chunks]
+        # Chunks are in size order; put the results back in the bills' order
+        results = [None] * len(bills)
+        for indices, chunk in zip(chunk_indices, chunk_results):
+            for bill_idx, result in zip(indices, chunk):
+                results[bill_idx] = result
+        split_time = time.perf_counter() - start
+
+    if bills is not None:
+        _settle(bills, results, mode)
+
+    total_time = time.perf_counter() - start
+    timings = {
+        "bills": len(results),
+        "split_seconds": split_time,
+        "settlement_seconds": total_time - split_time,
+        "total_seconds": total_time,
+        "bills_per_second": len(results) / total_time if total_time > 0 else float("inf"),
+    }
+    return BatchResult(results, timings)
+
+
+class IncrementalSplit:
+    """
+    Paise split state that is patched row by row instead of recomputed
+    Rows are editor slots; a blank or deleted slot is kept with zero price and weights
+    Per-person totals are updated by subtracting a row's old split and adding its new one
+    """
+
+    def __init__(self, n_people):
+        self.n_people = n_people
+        self.names = []
+        self.price_paise = np.zeros(0, dtype=np.int64)
+        self.weights = np.zeros((0, n_people), dtype=np.float64)
+        self.splits = np.zeros((0, n_people), dtype=np.int64)
+        self.person_totals = np.zeros(n_people, dtype=np.int64)
+
+    def _grow(self, n_rows):
+        extra = n_rows - len(self.names)
+        if extra <= 0:
+            return
+        self.names.extend([None] * extra)
+        self.price_paise = np.concatenate([self.price_paise, np.zeros(extra, dtype=np.int64)])
+        self.weights = np.vstack([self.weights, np.zeros((extra, self.n_people))])
+        self.splits = np.vstack([self.splits, np.zeros((extra, self.n_people), dtype=np.int64)])
+
+    def update_rows(self, rows, names, final_prices, weights):
+        """
+        Re-split only the given rows; names of None mark a row as blank
+        """
+        if not len(rows):
+            return
+        rows = np.asarray(rows, dtype=np.int64)
+        self._grow(int(rows.max()) + 1)
+
+        valid = np.array([name is not None for name in names])
+        price_paise = np.where(valid, to_paise(final_prices), 0)
+        weights = as_weight_matrix(weights, len(rows), self.n_people) * valid[:, None]
+        new_splits = split_matrix_paise(price_paise, weights)
+
+        self.person_totals += new_splits.sum(axis=0) - self.splits[rows].sum(axis=0)
+        self.splits[rows] = new_splits
+        self.price_paise[rows] = price_paise
+        self.weights[rows] = weights
+        for row, name in zip(rows.tolist(), names):
+            self.names[row] = name
+
+    def snapshot(self):
+        """
+        Current items, prices (rupees), weights and SplitResult (paise) for the non-blank rows
+        """
+        rows = [row for row, name in enumerate(self.names) if name is not None]
+        items = [self.names[row] for row in rows]
+        splits = self.splits[rows]
+        result = SplitResult(splits, self.person_totals.copy(), splits.sum(axis=1))
+        return items, from_paise(self.price_paise[rows]).tolist(), self.weights[rows].tolist(), result
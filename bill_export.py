@@ -0,0 +1,119 @@
+import io
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from bill_engine import as_sparse_weights, is_sparse
+
+CHUNK_ROWS = 10000  # rows per to_csv call, so big groups never build one huge frame of text
+MONEY_FORMAT = "%.2f"
+
+# (title, table, float format) in the order they appear in the CSV
+CSV_SECTIONS = (
+    ("Items Breakdown", "items", MONEY_FORMAT),
+    ("Weight Matrix", "weights", None),
+    ("Final Split", "split", MONEY_FORMAT),
+)
+TABLE_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+
+def export_tables(items, final_prices, people, person_totals, paid_amounts, edited_weights, generated=None):
+    """
+    The bill as numeric DataFrames: summary (one row), items, weights (people x items) and split
+    edited_weights may also be sparse weights (items x people), giving a long Item/Person/Weight table
+    """
+    if generated is None:
+        generated = pd.Timestamp.now()
+    n_items = min(len(items), len(final_prices))
+    items_df = pd.DataFrame({
+        "Item": list(items[:n_items]),
+        "Price": pd.Series(list(final_prices[:n_items]), dtype=float),
+    })
+
+    if is_sparse(edited_weights):
+        # Sparse weights export in long form: one row per non-zero (item, person) weight
+        shares = as_sparse_weights(edited_weights, n_items, len(people))
+        weights_df = pd.DataFrame({
+            "Item": np.asarray(items, dtype=object)[shares.items],
+            "Person": np.asarray(people, dtype=object)[shares.people],
+            "Weight": shares.values,
+        })
+    else:
+        weights_df = edited_weights.reset_index(drop=True).copy()
+        weights_df["Person"] = list(people)
+
+    split_df = pd.DataFrame({
+        "Person": list(people),
+        "Should Pay": pd.Series(person_totals, dtype=float),
+        "Paid": pd.Series(paid_amounts, dtype=float),
+    })
+    split_df["Balance"] = split_df["Paid"] - split_df["Should Pay"]
+
+    summary_df = pd.DataFrame({
+        "Generated": [generated.floor("s")],
+        "Total Bill": [float(items_df["Price"].sum())],
+        "People": [len(people)],
+        "Items": [n_items],
+        "Total Paid": [float(split_df["Paid"].sum())],
+    })
+    return {"summary": summary_df, "items": items_df, "weights": weights_df, "split": split_df}
+
+
+def _iter_frame_csv(df, float_format=None, chunk_rows=CHUNK_ROWS):
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(
+            index=False, header=start == 0, float_format=float_format, lineterminator="\n"
+        )
+
+
+def iter_csv_export(tables, chunk_rows=CHUNK_ROWS):
+    """
+    Yield the sectioned CSV export in chunks; numbers stay numbers and names are quoted as needed
+    """
+    summary = tables["summary"].iloc[0]
+    yield "Bill Split Summary\n"
+    yield pd.DataFrame({
+        "Field": ["Generated", "Total Bill"],
+        "Value": [summary["Generated"].strftime("%Y-%m-%d %H:%M:%S"), f"{summary['Total Bill']:.2f}"],
+    }).to_csv(index=False, header=False, lineterminator="\n")
+
+    for title, name, float_format in CSV_SECTIONS:
+        yield f"\n{title}\n"
+        yield from _iter_frame_csv(tables[name], float_format, chunk_rows)
+
+
+def write_csv_export(file, tables, chunk_rows=CHUNK_ROWS):
+    """
+    Stream the CSV export into an open text file
+    """
+    for chunk in iter_csv_export(tables, chunk_rows):
+        file.write(chunk)
+
+
+def _table_bytes(df, fmt):
+    # pyarrow ships with streamlit, but keep it an import-time-optional dependency here
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, sink)
+    else:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue()
+
+
+def export_archive(tables, fmt="parquet"):
+    """
+    Zip of one Parquet or Arrow IPC file per table (summary, items, weights, split)
+    """
+    if fmt not in TABLE_FORMATS:
+        raise ValueError(f"Unknown table format: {fmt}")
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, df in tables.items():
+            archive.writestr(f"{name}{TABLE_FORMATS[fmt]}", _table_bytes(df, fmt))
+    return output.getvalue()
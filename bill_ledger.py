@@ -0,0 +1,270 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from bill_engine import as_price_vector, as_sparse_weights, compute_split, is_sparse, to_paise, values_at
+from settlement import GroupBalances
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_DB = os.environ.get("BILL_LEDGER_DB", os.path.join(DATA_DIR, "bill_ledger.sqlite3"))
+
+# Amounts are stored as integer paise so SQL sums are exact
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bills (
+    id INTEGER PRIMARY KEY,
+    group_name TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL DEFAULT '',
+    created TEXT NOT NULL,
+    total_paise INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bill_people (
+    bill_id INTEGER NOT NULL REFERENCES bills(id) ON DELETE CASCADE,
+    person TEXT NOT NULL,
+    owed_paise INTEGER NOT NULL,
+    paid_paise INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS shares (
+    bill_id INTEGER NOT NULL REFERENCES bills(id) ON DELETE CASCADE,
+    item TEXT NOT NULL,
+    person TEXT NOT NULL,
+    weight REAL NOT NULL,
+    amount_paise INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    bill_id INTEGER NOT NULL REFERENCES bills(id) ON DELETE CASCADE,
+    from_person TEXT NOT NULL,
+    to_person TEXT NOT NULL,
+    amount_paise INTEGER NOT NULL
+);
+-- Running net per person per group (positive = owes), kept up to date on every save and delete
+CREATE TABLE IF NOT EXISTS group_balances (
+    group_name TEXT NOT NULL,
+    person TEXT NOT NULL,
+    net_paise INTEGER NOT NULL,
+    PRIMARY KEY (group_name, person)
+);
+CREATE INDEX IF NOT EXISTS bills_created ON bills(created);
+CREATE INDEX IF NOT EXISTS bills_group_created ON bills(group_name, created);
+CREATE INDEX IF NOT EXISTS bill_people_person ON bill_people(person, bill_id);
+CREATE INDEX IF NOT EXISTS shares_person ON shares(person, bill_id);
+CREATE INDEX IF NOT EXISTS shares_bill ON shares(bill_id);
+CREATE INDEX IF NOT EXISTS transactions_bill ON transactions(bill_id);
+CREATE INDEX IF NOT EXISTS transactions_from ON transactions(from_person);
+CREATE INDEX IF NOT EXISTS transactions_to ON transactions(to_person);
+"""
+
+# One connection per database per server process, shared by the Streamlit session threads
+_pool = {}
+_pool_lock = threading.Lock()
+
+
+def get_connection(path=DEFAULT_DB):
+    """
+    The process's pooled connection to path, opened (and migrated) on first use
+    Returns (connection, lock); hold the lock while using the connection
+    """
+    key = (os.getpid(), os.path.abspath(path))
+    with _pool_lock:
+        pooled = _pool.get(key)
+        if pooled is None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            connection = sqlite3.connect(path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            connection.executescript(SCHEMA)
+            _backfill_group_balances(connection)
+            pooled = _pool[key] = (connection, threading.Lock())
+    return pooled
+
+
+def _backfill_group_balances(connection):
+    # Ledgers saved before group_balances existed get it rebuilt once from bill_people
+    with connection:
+        if connection.execute("SELECT 1 FROM group_balances LIMIT 1").fetchone():
+            return
+        connection.execute("""
+            INSERT INTO group_balances (group_name, person, net_paise)
+            SELECT b.group_name, bp.person, SUM(bp.owed_paise - bp.paid_paise)
+            FROM bill_people bp JOIN bills b ON b.id = bp.bill_id
+            GROUP BY b.group_name, bp.person
+        """)
+
+
+_UPDATE_GROUP_BALANCE = """
+    INSERT INTO group_balances (group_name, person, net_paise) VALUES (?, ?, ?)
+    ON CONFLICT (group_name, person) DO UPDATE SET net_paise = net_paise + excluded.net_paise
+"""
+
+
+def _cutoff(days, now=None):
+    now = now or datetime.now()
+    return (now - timedelta(days=days)).isoformat(" ", "seconds")
+
+
+class BillLedger:
+    """
+    Every saved bill with its item shares, payments and settlement transfers
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.connection, self.lock = get_connection(path)
+
+    def save_bill(self, people, items, final_prices, weights, paid_amounts=None, transactions=(),
+                  group="", name="", created=None, splits_paise=None):
+        """
+        Store one bill in a single transaction and return its ID
+        splits_paise is the items x people paise split from main(); otherwise it is computed here
+        weights and splits_paise may be dense or sparse
+        """
+        n_items, n_people = len(items), len(people)
+        prices = as_price_vector(final_prices, n_items)
+        # Only the non-zero shares are stored, so work on the weights in sparse form
+        shares = as_sparse_weights(weights, n_items, n_people)
+        if splits_paise is None:
+            split = compute_split(prices, shares, n_people=n_people, mode="paise")
+            amounts, owed = split.splits.values, split.person_totals
+        else:
+            splits_paise = splits_paise if is_sparse(splits_paise) else np.asarray(splits_paise, dtype=np.int64)
+            amounts = values_at(splits_paise, shares).astype(np.int64)
+            owed = np.bincount(shares.people, amounts, minlength=n_people).astype(np.int64)
+        paid = np.zeros(n_people) if paid_amounts is None else as_price_vector(paid_amounts, n_people)
+        created = (created or datetime.now()).isoformat(" ", "seconds")
+
+        share_rows = zip(
+            [items[i] for i in shares.items], [people[p] for p in shares.people],
+            shares.values.astype(float).tolist(), amounts.tolist(),
+        )
+        owed_paise, paid_paise = owed.tolist(), to_paise(paid).tolist()
+        people_rows = list(zip(people, owed_paise, paid_paise))
+        transaction_rows = [(str(t[0]), str(t[1]), int(to_paise(t[2]))) for t in transactions]
+
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO bills (group_name, name, created, total_paise) VALUES (?, ?, ?, ?)",
+                (group, name, created, int(to_paise(prices).sum())),
+            )
+            bill_id = cursor.lastrowid
+            self.connection.executemany(
+                "INSERT INTO shares (bill_id, item, person, weight, amount_paise) VALUES (?, ?, ?, ?, ?)",
+                ((bill_id, *row) for row in share_rows),
+            )
+            self.connection.executemany(
+                "INSERT INTO bill_people (bill_id, person, owed_paise, paid_paise) VALUES (?, ?, ?, ?)",
+                ((bill_id, *row) for row in people_rows),
+            )
+            self.connection.executemany(
+                "INSERT INTO transactions (bill_id, from_person, to_person, amount_paise) VALUES (?, ?, ?, ?)",
+                ((bill_id, *row) for row in transaction_rows),
+            )
+            self.connection.executemany(
+                _UPDATE_GROUP_BALANCE,
+                ((group, person, owed - paid) for person, owed, paid in people_rows),
+            )
+        return bill_id
+
+    def delete_bill(self, bill_id):
+        """
+        Remove a bill and take its people's nets back out of the group balances
+        """
+        with self.lock, self.connection:
+            rows = self.connection.execute("""
+                SELECT b.group_name, bp.person, bp.paid_paise - bp.owed_paise
+                FROM bill_people bp JOIN bills b ON b.id = bp.bill_id
+                WHERE b.id = ?
+            """, (bill_id,)).fetchall()
+            self.connection.executemany(_UPDATE_GROUP_BALANCE, rows)
+            self.connection.execute("DELETE FROM bills WHERE id = ?", (bill_id,))
+
+    def group_balances(self, group=""):
+        """
+        The group's running balances as a GroupBalances, ready for one consolidated settle()
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT person, net_paise FROM group_balances WHERE group_name = ? AND net_paise != 0",
+                (group,),
+            ).fetchall()
+        balances = GroupBalances()
+        if rows:
+            people, net_paise = zip(*rows)
+            balances.add_net(group, people, net_paise)
+        return balances
+
+    def _query(self, sql, params):
+        with self.lock:
+            return pd.read_sql_query(sql, self.connection, params=params)
+
+    def person_owed(self, person, days=90, group=None, now=None):
+        """
+        What person owed, paid and still stands at across the last days, in rupees
+        """
+        sql = """
+            SELECT COUNT(*) AS bills,
+                   COALESCE(SUM(bp.owed_paise), 0) AS owed_paise,
+                   COALESCE(SUM(bp.paid_paise), 0) AS paid_paise
+            FROM bill_people bp JOIN bills b ON b.id = bp.bill_id
+            WHERE bp.person = ? AND b.created >= ?
+        """
+        params = [person, _cutoff(days, now)]
+        if group is not None:
+            sql += " AND b.group_name = ?"
+            params.append(group)
+        with self.lock:
+            bills, owed_paise, paid_paise = self.connection.execute(sql, params).fetchone()
+        return {
+            "bills": bills,
+            "owed": owed_paise / 100,
+            "paid": paid_paise / 100,
+            "balance": (paid_paise - owed_paise) / 100,
+        }
+
+    def person_summary(self, days=90, group=None, now=None):
+        """
+        Per-person bills, owed, paid and balance (rupees) across the last days
+        """
+        sql = """
+            SELECT bp.person AS person,
+                   COUNT(*) AS bills,
+                   SUM(bp.owed_paise) / 100.0 AS owed,
+                   SUM(bp.paid_paise) / 100.0 AS paid,
+                   (SUM(bp.paid_paise) - SUM(bp.owed_paise)) / 100.0 AS balance
+            FROM bill_people bp JOIN bills b ON b.id = bp.bill_id
+            WHERE b.created >= ?
+        """
+        params = [_cutoff(days, now)]
+        if group is not None:
+            sql += " AND b.group_name = ?"
+            params.append(group)
+        sql += " GROUP BY bp.person ORDER BY balance"
+        return self._query(sql, params)
+
+    def item_spend(self, person, days=90, group=None, now=None):
+        """
+        What person's shares went on, item by item, across the last days
+        """
+        sql = """
+            SELECT s.item AS item, COUNT(*) AS times, SUM(s.amount_paise) / 100.0 AS amount
+            FROM shares s JOIN bills b ON b.id = s.bill_id
+            WHERE s.person = ? AND b.created >= ?
+        """
+        params = [person, _cutoff(days, now)]
+        if group is not None:
+            sql += " AND b.group_name = ?"
+            params.append(group)
+        sql += " GROUP BY s.item ORDER BY amount DESC"
+        return self._query(sql, params)
+
+    def recent_bills(self, group=None, limit=20):
+        sql = "SELECT id, group_name, name, created, total_paise / 100.0 AS total FROM bills"
+        params = []
+        if group is not None:
+            sql += " WHERE group_name = ?"
+            params.append(group)
+        sql += " ORDER BY created DESC LIMIT ?"
+        params.append(limit)
+        return self._query(sql, params)
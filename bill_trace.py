@@ -0,0 +1,91 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Tracing is per rerun: main() turns it on for debug sessions, or BILL_TRACE=1 turns it on everywhere
+ALWAYS_ON = os.environ.get("BILL_TRACE") == "1"
+TRACE_FILE = os.environ.get("BILL_TRACE_FILE")  # append every traced rerun here as a JSON line
+HISTORY = 500
+
+# Each Streamlit session runs its script on its own thread, so the open trace is thread-local
+_local = threading.local()
+_history = deque(maxlen=HISTORY)
+_history_lock = threading.Lock()
+_NOOP = contextlib.nullcontext()
+
+
+class _Phase:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace[self.name] = self.trace.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+def phase(name):
+    """
+    Context manager timing one phase of the current rerun
+    With tracing off it hands back a shared no-op, so the hooks can stay in place
+    """
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        return _NOOP
+    return _Phase(trace, name)
+
+
+def start_rerun(enabled=False):
+    _local.trace = {} if enabled or ALWAYS_ON else None
+    _local.started = time.perf_counter()
+
+
+def end_rerun():
+    """
+    Close the current rerun's trace and return it as {"time", "total", "phases"}, or None if off
+    """
+    trace = getattr(_local, "trace", None)
+    _local.trace = None
+    if trace is None:
+        return None
+
+    record = {
+        "time": time.time(),
+        "total": time.perf_counter() - _local.started,
+        "phases": trace,
+    }
+    with _history_lock:
+        _history.append(record)
+    if TRACE_FILE:
+        with open(TRACE_FILE, "a", encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+    return record
+
+
+def trace_history():
+    with _history_lock:
+        return list(_history)
+
+
+def phase_samples():
+    """
+    {phase: [seconds per rerun]} across the kept history, for histograms
+    """
+    samples = {}
+    for record in trace_history():
+        for name, seconds in record["phases"].items():
+            samples.setdefault(name, []).append(seconds)
+    return samples
+
+
+def traces_jsonl():
+    return "".join(json.dumps(record) + "\n" for record in trace_history())
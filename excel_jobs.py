@@ -0,0 +1,105 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from excel_writer import excel_bytes
+
+# Jobs live here, not in the Streamlit script, so they survive reruns and are shared by all sessions
+MAX_WORKERS = 4
+MAX_PENDING = 32
+JOB_TTL = 3600  # seconds an uncollected finished job is kept
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="excel")
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class ExcelJob:
+    """
+    One queued excel_bytes call and how far it has got
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.section = "queued"
+        self.progress = 0.0
+        self.finished_at = None
+        self.future = None
+
+    def report(self, section, fraction):
+        self.section = section
+        self.progress = fraction
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        return self.future.result()
+
+
+def _run(job, people, items, kwargs):
+    job.section = "starting"
+    try:
+        return excel_bytes(people, items, progress=job.report, **kwargs)
+    finally:
+        job.finished_at = time.monotonic()
+        _slots.release()
+
+
+def _prune():
+    now = time.monotonic()
+    with _jobs_lock:
+        stale = [job_id for job_id, job in _jobs.items()
+                 if job.finished_at is not None and now - job.finished_at > JOB_TTL]
+        for job_id in stale:
+            del _jobs[job_id]
+
+
+def submit_excel(people, items, **kwargs):
+    """
+    Queue excel_bytes(people, items, **kwargs) on the worker pool and return the job ID
+    The job's result is the .xlsx file as bytes
+    Raises RuntimeError when MAX_PENDING jobs are already waiting or running
+    """
+    if not _slots.acquire(blocking=False):
+        raise RuntimeError("Too many Excel files are being generated right now, please try again shortly")
+    _prune()
+
+    job = ExcelJob(uuid.uuid4().hex)
+    with _jobs_lock:
+        _jobs[job.job_id] = job
+    try:
+        job.future = _executor.submit(_run, job, people, items, kwargs)
+    except Exception:
+        _slots.release()
+        with _jobs_lock:
+            del _jobs[job.job_id]
+        raise
+    return job.job_id
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def pop_job(job_id):
+    """
+    Forget a job once its result has been collected
+    """
+    with _jobs_lock:
+        return _jobs.pop(job_id, None)
+
+
+def _write_file(path, data):
+    with open(path, "wb") as file:
+        file.write(data)
+
+
+def save_async(path, data):
+    """
+    Write bytes to disk on the worker pool and return the Future
+    """
+    return _executor.submit(_write_file, path, data)
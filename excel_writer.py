@@ -0,0 +1,515 @@
+import io
+import re
+import zipfile
+from collections import namedtuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import CellIsRule
+from openpyxl.styles import Font, Alignment, PatternFill, Border, Side, NamedStyle
+from openpyxl.worksheet.formula import ArrayFormula
+
+from bill_engine import as_price_vector, as_weight_matrix, compute_split
+
+
+MAX_COLUMNS = 16384  # XFD
+MAX_ROWS = 1048576
+
+
+def _column_letters():
+    #Index 1 -> A, 26 -> Z, 27 -> AA ... up to XFD
+    letters = [""]
+    for n in range(1, MAX_COLUMNS + 1):
+        name = ""
+        while n:
+            n, rem = divmod(n - 1, 26)
+            name = chr(rem + 65) + name
+        letters.append(name)
+    return tuple(letters)
+
+
+COLUMN_LETTERS = _column_letters()
+
+
+def number2letter(n):
+    return COLUMN_LETTERS[n]
+
+
+# Shared style objects, built once and referenced by every workbook
+BOLD = Font(bold=True)
+CENTER = Alignment(horizontal='center')
+THIN_BORDER = Border(left=Side(border_style='thin'),
+                     right=Side(border_style='thin'),
+                     top=Side(border_style='thin'),
+                     bottom=Side(border_style='thin'))
+TOTAL_FILL = PatternFill(start_color='ff4d73', end_color='ff4d73', fill_type='solid')
+SEPARATOR_FILL = PatternFill(start_color='000000', end_color='000000', fill_type='solid')
+RED_FILL = PatternFill(start_color='FF0000', end_color='FF0000', fill_type='solid')
+GREEN_FILL = PatternFill(start_color='00FF00', end_color='00FF00', fill_type='solid')
+
+# Style key -> (named style name, font, alignment, border, fill)
+STYLES = {
+    "header": ("Bill Header", BOLD, CENTER, THIN_BORDER, None),
+    "bold": ("Bill Bold", BOLD, None, None, None),
+    "body": ("Bill Body", None, CENTER, THIN_BORDER, None),
+    "cell": ("Bill Cell", None, None, THIN_BORDER, None),
+    "total": ("Bill Total", BOLD, CENTER, None, None),
+    "total_fill": ("Bill Total Highlight", BOLD, CENTER, None, TOTAL_FILL),
+    "total_fill_border": ("Bill Total Highlight Border", BOLD, CENTER, THIN_BORDER, TOTAL_FILL),
+    "separator": ("Bill Separator", None, None, None, SEPARATOR_FILL),
+}
+
+
+def register_styles(wb):
+    """
+    Add one NamedStyle per style key to the workbook; cells then refer to it by name
+    NamedStyle objects bind to a single workbook, so they are created per workbook
+    """
+    for name, font, alignment, border, fill in STYLES.values():
+        style = NamedStyle(name=name)
+        if font is not None:
+            style.font = font
+        if alignment is not None:
+            style.alignment = alignment
+        if border is not None:
+            style.border = border
+        if fill is not None:
+            style.fill = fill
+        wb.add_named_style(style)
+
+
+# Anchor rows/columns and formula addresses of every table on the "Bill Split" sheet
+SheetLayout = namedtuple("SheetLayout", [
+    "n_items", "n_people",
+    "item_total_row",   # row of the Final Price grand total
+    "split_row",        # header row of the weighted split table
+    "balance_row",      # Balance row under the split table
+    "weights_row",      # header row of the weights table
+    "weights_sum_row",  # Sum row under the weights table
+    "separator_rows",   # black separator rows
+    "settle_col",       # first column of the Paid/Split/Owes table
+    "width",            # separator rows span columns 1..width
+    "last_row",
+    "item_letters",     # column letter of each item in the split/weights tables
+    "last_item_letter",
+    "total_letter",     # PP Total column
+    "settle_letters",   # Name, Paid, Split, Owes columns
+])
+
+
+def plan_layout(people, items):
+    """
+    Work out where every table and formula goes before anything is written
+    """
+    n_items, n_people = len(items), len(people)
+
+    item_total_row = n_items + 3
+    split_row = n_items + 7
+    balance_row = split_row + n_people + 3
+    weights_row = split_row + n_people + 7
+    weights_sum_row = weights_row + n_people + 2
+    separator_rows = (n_items + 5, split_row + n_people + 5, weights_row + n_people + 4)
+
+    # Paid/Split/Owes table sits two columns right of everything else (separators reach n_items+5, column G is filled)
+    settle_col = max(n_items + 5, 7) + 2
+
+    if settle_col + 3 > MAX_COLUMNS or separator_rows[-1] > MAX_ROWS:
+        raise ValueError(f"{n_items} items x {n_people} people does not fit on one Excel sheet")
+
+    item_letters = COLUMN_LETTERS[2:n_items + 2]
+    return SheetLayout(
+        n_items, n_people, item_total_row, split_row, balance_row, weights_row, weights_sum_row,
+        separator_rows, settle_col, n_items + 5, separator_rows[-1],
+        item_letters, COLUMN_LETTERS[n_items + 1], COLUMN_LETTERS[n_items + 3],
+        COLUMN_LETTERS[settle_col:settle_col + 4],
+    )
+
+
+# Bill data for filling the sheet; splits are items x people, same as bill_engine
+BillValues = namedtuple("BillValues", [
+    "prices", "weights", "paid", "splits", "person_totals", "item_totals", "weight_sums",
+])
+
+
+def compute_bill_values(people, items, final_prices, weights, paid_amounts=None):
+    """
+    Run the Python split engine for everything the sheet's formulas would compute
+    """
+    # The sheet shows every cell, so sparse weights are laid out dense here
+    matrix = as_weight_matrix(weights, len(items), len(people))
+    result = compute_split(list(final_prices)[:len(items)], matrix, n_people=len(people))
+    paid = np.zeros(len(people)) if paid_amounts is None else as_price_vector(paid_amounts, len(people))
+    return BillValues(
+        as_price_vector(final_prices, len(items)), matrix, paid,
+        result.splits, result.person_totals, result.item_totals, matrix.sum(axis=1),
+    )
+
+
+class _SheetValues:
+    """
+    Decides what goes in a formula cell: the formula, its computed value, or both
+    values=None writes formulas only, "static" writes computed values, "cached" keeps
+    formulas and records the computed values for add_cached_values
+    """
+
+    def __init__(self, bill=None, values=None):
+        self.bill = bill
+        self.values = values
+        self.cached = {}
+
+    def formula(self, ref, formula, computed):
+        if self.bill is None or self.values is None:
+            return formula
+        if self.values == "static":
+            return computed
+        self.cached[ref] = computed
+        return formula
+
+    def input(self, value):
+        return None if self.bill is None else float(value)
+
+
+def _items_table(cells, row, items, layout, sheet):
+    #Column A item names, B price, C quantity, E final price
+    bill = sheet.bill
+    if row == 1:
+        cells[1] = ("Item", "header")
+        cells[2] = ("Price", "header")
+        cells[3] = ("Quantity", "header")
+        cells[4] = (None, "bold")
+        cells[5] = ("Final Price", "header")
+    elif row <= layout.n_items + 1:
+        item_idx = row - 2
+        cells[1] = (items[item_idx], "header")
+        cells[2] = (sheet.input(bill.prices[item_idx]) if bill else None, "body")
+        cells[3] = (sheet.input(1) if bill else None, "body")
+        price = float(bill.prices[item_idx]) if bill else None
+        cells[5] = (sheet.formula(f"E{row}", f"=B{row}*C{row}", price), "header")
+    elif row == layout.item_total_row:
+        total = float(bill.prices.sum()) if bill else None
+        cells[5] = (sheet.formula(f"E{row}", f"=SUM(E2:E{layout.n_items + 1})", total), "total")
+
+    #Column G is a black divider next to the items table
+    if row <= layout.n_items + 5:
+        cells[7] = (None, "separator")
+
+
+def _split_table(cells, row, people, items, layout, sheet, formulas="cell"):
+    n_items, n_people = layout.n_items, layout.n_people
+    top = layout.split_row
+    total_col = n_items + 3
+    letters = layout.item_letters
+    bill = sheet.bill
+
+    if row == top:
+        cells[1] = (None, "cell")
+        for i, item in enumerate(items):
+            cells[i + 2] = (item, "header")
+        cells[total_col] = ("PP Total", "header")
+    elif top < row <= top + n_people:
+        person_idx = row - top - 1
+        weight_row = layout.weights_row + row - top
+        cells[1] = (people[person_idx], "header")
+        for j, col in enumerate(letters):
+            sum_cell = f'{col}{layout.weights_sum_row}'
+            split = None
+            if bill:
+                split = float(bill.splits[j, person_idx]) if bill.weight_sums[j] > 0 else ""
+            if formulas == "array":
+                # One array formula fills the whole item column; the other cells only carry the style
+                formula = None
+                if row == top + 1:
+                    weights = f'{col}{layout.weights_row + 1}:{col}{layout.weights_row + n_people}'
+                    formula = ArrayFormula(
+                        f'{col}{top + 1}:{col}{top + n_people}',
+                        f'=IF({sum_cell}=0, "", {weights}/{sum_cell}*E{j + 2})',
+                    )
+            else:
+                # Use the IF formula to avoid division by zero
+                formula = f'=IF({sum_cell}=0, "", {col}{weight_row}/{sum_cell}*E{j + 2})'
+            cells[j + 2] = (sheet.formula(f"{col}{row}", formula, split), "cell")
+        person_total = float(bill.person_totals[person_idx]) if bill else None
+        formula = f'=SUM(B{row}:{layout.last_item_letter}{row})'
+        cells[total_col] = (sheet.formula(f"{layout.total_letter}{row}", formula, person_total), "header")
+    elif row == top + n_people + 1:
+        col = layout.total_letter
+        total = float(bill.person_totals.sum()) if bill else None
+        formula = f'=SUM({col}{top + 1}:{col}{top + n_people})'
+        cells[total_col] = (sheet.formula(f"{col}{row}", formula, total), "total_fill_border")
+    elif row == top + n_people + 2:
+        cells[1] = ("Item Total", "header")
+        for j, col in enumerate(letters):
+            item_total = float(bill.item_totals[j]) if bill else None
+            formula = f'=SUM({col}{top + 1}:{col}{top + n_people})'
+            cells[j + 2] = (sheet.formula(f"{col}{row}", formula, item_total), "header")
+        total = float(bill.item_totals.sum()) if bill else None
+        formula = f'=SUM(B{row}:{layout.last_item_letter}{row})'
+        cells[n_items + 2] = (sheet.formula(f"{COLUMN_LETTERS[n_items + 2]}{row}", formula, total), "total_fill")
+    elif row == layout.balance_row:
+        cells[1] = ("Balance", "header")
+        for j, col in enumerate(letters):
+            balance = float(bill.prices[j] - bill.item_totals[j]) if bill else None
+            cells[j + 2] = (sheet.formula(f"{col}{row}", f'=E{j + 2}-{col}{row - 1}', balance), "header")
+
+
+def _weights_table(cells, row, people, items, layout, sheet):
+    top = layout.weights_row
+    n_people = layout.n_people
+    bill = sheet.bill
+
+    if row == top:
+        cells[1] = (None, "cell")
+        for i, item in enumerate(items):
+            cells[i + 2] = (item, "header")
+    elif top < row <= top + n_people:
+        person_idx = row - top - 1
+        cells[1] = (people[person_idx], "header")
+        for j in range(layout.n_items):
+            cells[j + 2] = (sheet.input(bill.weights[j, person_idx]) if bill else None, "cell")
+    elif row == layout.weights_sum_row:
+        cells[1] = ("Sum", "header")
+        for j, col in enumerate(layout.item_letters):
+            weight_sum = float(bill.weight_sums[j]) if bill else None
+            formula = f'=SUM({col}{top + 1}:{col}{top + n_people})'
+            cells[j + 2] = (sheet.formula(f"{col}{row}", formula, weight_sum), "header")
+
+
+def _settlement_table(cells, row, people, layout, sheet):
+    n_people = layout.n_people
+    c = layout.settle_col
+    total_row = n_people + 3
+    _, paid, split, owes = layout.settle_letters
+    bill = sheet.bill
+
+    if row == 1:
+        cells[c] = (None, "header")
+        cells[c + 1] = ("Paid", "header")
+        cells[c + 2] = ("Split", "header")
+        cells[c + 3] = ("Owes", "header")
+    elif row <= n_people + 1:
+        person_idx = row - 2
+        cells[c] = (people[person_idx], "header")
+        cells[c + 1] = (sheet.input(bill.paid[person_idx]) if bill else None, "header")
+        person_total = float(bill.person_totals[person_idx]) if bill else None
+        owes_value = float(bill.paid[person_idx] - bill.person_totals[person_idx]) if bill else None
+        formula = f'={layout.total_letter}{layout.split_row + row - 1}'
+        cells[c + 2] = (sheet.formula(f"{split}{row}", formula, person_total), "header")
+        cells[c + 3] = (sheet.formula(f"{owes}{row}", f'={paid}{row}-{split}{row}', owes_value), "header")
+    elif row == total_row:
+        cells[c] = ("Total", "header")
+        totals = (None, None, None)
+        if bill:
+            paid_total, split_total = float(bill.paid.sum()), float(bill.person_totals.sum())
+            totals = (paid_total, split_total, paid_total - split_total)
+        for col, letter, total in zip(range(c + 1, c + 4), (paid, split, owes), totals):
+            formula = f'=SUM({letter}2:{letter}{total_row - 1})'
+            cells[col] = (sheet.formula(f"{letter}{row}", formula, total), "header")
+
+
+def section_ends(layout):
+    """
+    (section, last row) for each table, in the order a top-to-bottom write finishes them
+    """
+    ends = [
+        ("items table", layout.n_items + 5),
+        ("settlement table", layout.n_people + 3),
+        ("split table", layout.balance_row),
+        ("weights table", layout.weights_sum_row),
+    ]
+    return sorted(ends, key=lambda end: end[1])
+
+
+def iter_sheet_rows(people, items, layout=None, formulas="cell", sheet=None, progress=None):
+    """
+    Yield (row, {column: (value, style)}) for every row of the sheet, top to bottom
+    Only one row is held at a time, so streaming writers stay constant-memory
+    formulas="array" writes the split table as one array formula per item instead of one per cell
+    sheet carries the bill values when the sheet is filled in (see create_excel)
+    progress(section, fraction) is called once a table's last row has been written
+    """
+    if layout is None:
+        layout = plan_layout(people, items)
+    if sheet is None:
+        sheet = _SheetValues()
+    finished = {}
+    if progress is not None:
+        for section, last_row in section_ends(layout):
+            finished.setdefault(last_row, []).append(section)
+
+    for row in range(1, layout.last_row + 1):
+        cells = {}
+        if row in layout.separator_rows:
+            for col in range(1, layout.width + 1):
+                cells[col] = (None, "separator")
+        _items_table(cells, row, items, layout, sheet)
+        _split_table(cells, row, people, items, layout, sheet, formulas)
+        _weights_table(cells, row, people, items, layout, sheet)
+        _settlement_table(cells, row, people, layout, sheet)
+        yield row, cells
+
+        # The writer has taken the row by the time the generator resumes
+        for section in finished.get(row, ()):
+            progress(section, row / layout.last_row)
+
+
+def highlight_regions(layout):
+    """
+    Cell ranges that get the zero/non-zero highlight, one range per region
+    """
+    balance_row = layout.balance_row
+    return [f'B{balance_row}:{layout.last_item_letter}{balance_row}']
+
+
+def iter_conditional_formats(layout):
+    """
+    Yield (range, rule) pairs: the Balance row is green when an item is fully split, red otherwise
+    Each rule covers a whole region, so the sheet carries two rules per region instead of two per cell
+    """
+    for cell_range in highlight_regions(layout):
+        yield cell_range, CellIsRule(operator='equal', formula=['0'], stopIfTrue=True, fill=GREEN_FILL)
+        yield cell_range, CellIsRule(operator='notEqual', formula=['0'], stopIfTrue=True, fill=RED_FILL)
+
+
+def write_workbook(sheet_rows, conditional_formats):
+    """
+    Default backend: regular in-memory openpyxl Workbook
+    """
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Bill Split"
+    register_styles(wb)
+
+    for row, cells in sheet_rows:
+        for col, (value, style) in cells.items():
+            cell = ws.cell(row=row, column=col)
+            if value is not None:
+                cell.value = value
+            cell.style = STYLES[style][0]
+
+    for cell_range, rule in conditional_formats:
+        ws.conditional_formatting.add(cell_range, rule)
+
+    return wb
+
+
+def write_streaming(sheet_rows, conditional_formats):
+    """
+    Constant-memory backend: openpyxl write-only mode, rows are flushed as they are appended
+    The returned workbook can be saved once
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Bill Split")
+    register_styles(wb)
+
+    for cell_range, rule in conditional_formats:
+        ws.conditional_formatting.add(cell_range, rule)
+
+    for row, cells in sheet_rows:
+        values = [None] * max(cells, default=0)
+        for col, (value, style) in cells.items():
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = STYLES[style][0]
+            values[col - 1] = cell
+        ws.append(values)
+
+    return wb
+
+
+WRITERS = {
+    "openpyxl": write_workbook,
+    "write_only": write_streaming,
+}
+
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FORMULA_MODES = ("cell", "array")
+VALUE_MODES = (None, "static", "cached")
+
+
+def create_excel(people, items, writer="openpyxl", formulas="cell",
+                 final_prices=None, weights=None, paid_amounts=None, values=None, progress=None):
+    """
+    Build the bill split workbook
+    writer picks the backend from WRITERS: "openpyxl" (default) or "write_only" for large rosters
+    formulas="array" cuts the split table from people x items formulas to one per item
+    With final_prices and weights the sheet is filled in (quantity 1, paid amounts optional):
+    values="static" writes the split engine's results instead of formulas,
+    values="cached" keeps the formulas and stores their results as cached values (see workbook_to_bytes)
+    progress(section, fraction) reports each finished table (see iter_sheet_rows)
+    """
+    if writer not in WRITERS:
+        raise ValueError(f"Unknown Excel writer: {writer}")
+    if formulas not in FORMULA_MODES:
+        raise ValueError(f"Unknown formula mode: {formulas}")
+    if values not in VALUE_MODES:
+        raise ValueError(f"Unknown values mode: {values}")
+    if values is not None and (final_prices is None or weights is None):
+        raise ValueError("final_prices and weights are needed to write values")
+
+    bill = None
+    if final_prices is not None and weights is not None:
+        bill = compute_bill_values(people, items, final_prices, weights, paid_amounts)
+    sheet = _SheetValues(bill, values)
+
+    layout = plan_layout(people, items)
+    rows = iter_sheet_rows(people, items, layout, formulas, sheet, progress)
+    wb = WRITERS[writer](rows, iter_conditional_formats(layout))
+    # Filled in while the rows were written; workbook_to_bytes adds them to the saved file
+    wb.bill_cached_values = sheet.cached
+    return wb
+
+
+_CELL_PATTERN = re.compile(r'<c r="([A-Z]+[0-9]+)"((?: [a-zA-Z]+="[^"]*")*) ?(?:/>|>(.*?)</c>)', re.S)
+
+
+def add_cached_values(sheet_xml, cached):
+    """
+    Put cached results into formula cells (and array-formula ranges) of a saved sheet's XML
+    openpyxl always writes formulas with an empty <v/>, so this runs on the serialized sheet
+    """
+    def replace(match):
+        ref = match.group(1)
+        if ref not in cached or cached[ref] is None:
+            return match.group(0)
+        attrs = re.sub(r' t="[^"]*"', "", match.group(2))
+        body = match.group(3) or ""
+        formula = re.match(r'<f[^>]*>.*?</f>|<f[^>]*/>', body, re.S)
+        formula = formula.group(0) if formula else ""
+
+        value = cached[ref]
+        if isinstance(value, str):
+            return f'<c r="{ref}"{attrs} t="str">{formula}<v>{escape(value)}</v></c>'
+        return f'<c r="{ref}"{attrs}>{formula}<v>{value!r}</v></c>'
+
+    return _CELL_PATTERN.sub(replace, sheet_xml)
+
+
+def workbook_to_bytes(wb):
+    """
+    Serialize a workbook to .xlsx bytes, adding any cached formula results
+    """
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    cached = getattr(wb, "bill_cached_values", None)
+    if not cached:
+        return buffer.getvalue()
+
+    output = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(buffer.getvalue())) as source, \
+            zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as target:
+        for info in source.infolist():
+            data = source.read(info.filename)
+            if info.filename.startswith("xl/worksheets/sheet"):
+                data = add_cached_values(data.decode("utf-8"), cached).encode("utf-8")
+            target.writestr(info, data)
+    return output.getvalue()
+
+
+def excel_bytes(people, items, **kwargs):
+    """
+    create_excel straight to .xlsx bytes, ready for a download button
+    """
+    return workbook_to_bytes(create_excel(people, items, **kwargs))
@@ -0,0 +1,265 @@
+import time
+import numpy as np
+
+
+def calculate_settlement_transactions(people, paid_amounts, person_totals):
+    """
+    Calculate who should pay whom to settle the bill
+    Returns a list of transactions: (from_person, to_person, amount)
+    """
+    # Calculate net amounts (positive = owes money, negative = should receive money)
+    net_amounts = {}
+    for i, person in enumerate(people):
+        net_amounts[person] = person_totals[i] - paid_amounts[i]
+    
+    # Separate people who owe money from those who should receive money
+    debtors = {person: amount for person, amount in net_amounts.items() if amount > 0}
+    creditors = {person: -amount for person, amount in net_amounts.items() if amount < 0}
+    
+    transactions = []
+    
+    # Sort by amounts to make settling more efficient
+    debtors_sorted = sorted(debtors.items(), key=lambda x: x[1], reverse=True)
+    creditors_sorted = sorted(creditors.items(), key=lambda x: x[1], reverse=True)
+    
+    debtor_idx = 0
+    creditor_idx = 0
+    
+    while debtor_idx < len(debtors_sorted) and creditor_idx < len(creditors_sorted):
+        debtor_name, debt_amount = debtors_sorted[debtor_idx]
+        creditor_name, credit_amount = creditors_sorted[creditor_idx]
+        
+        # Calculate transaction amount
+        transaction_amount = min(debt_amount, credit_amount)
+        
+        if transaction_amount > 0.01:  # Only include transactions > 1 paisa
+            transactions.append((debtor_name, creditor_name, transaction_amount))
+        
+        # Update amounts
+        debtors_sorted[debtor_idx] = (debtor_name, debt_amount - transaction_amount)
+        creditors_sorted[creditor_idx] = (creditor_name, credit_amount - transaction_amount)
+        
+        # Move to next debtor/creditor if current one is settled
+        if debtors_sorted[debtor_idx][1] <= 0.01:
+            debtor_idx += 1
+        if creditors_sorted[creditor_idx][1] <= 0.01:
+            creditor_idx += 1
+    
+    return transactions
+
+
+def _net_paise(paid_amounts, person_totals):
+    """
+    Net balance per person in integer paise (positive = owes money)
+    """
+    totals = np.asarray(person_totals, dtype=np.float64)
+    paid = np.asarray(paid_amounts, dtype=np.float64)
+    return np.rint((totals - paid) * 100).astype(np.int64)
+
+
+def _max_zero_sum_groups(balances, deadline):
+    """
+    Bitmask DP: best[mask] = most disjoint zero-sum groups that mask can be split into
+    Masks are processed in layers of equal popcount so each layer only reads finished values
+    Returns the best table and the zero-sum flags, or None if the deadline passes
+    """
+    n = len(balances)
+    size = 1 << n
+
+    # Subset sums and popcounts for every mask, built one bit at a time
+    sums = np.zeros(size, dtype=np.int64)
+    popcount = np.zeros(size, dtype=np.int8)
+    for i in range(n):
+        sums[1 << i:1 << (i + 1)] = sums[:1 << i] + balances[i]
+        popcount[1 << i:1 << (i + 1)] = popcount[:1 << i] + 1
+    is_zero = (sums == 0).astype(np.int8)
+
+    best = np.zeros(size, dtype=np.int8)
+    layers = np.argsort(popcount, kind="stable")
+    bounds = np.searchsorted(popcount[layers], np.arange(n + 2))
+    for k in range(1, n + 1):
+        masks = layers[bounds[k]:bounds[k + 1]]
+        layer_best = np.full(len(masks), -1, dtype=np.int8)
+        for i in range(n):
+            has_bit = (masks >> i) & 1 == 1
+            candidate = np.where(has_bit, best[masks & ~(1 << i)], -1)
+            np.maximum(layer_best, candidate, out=layer_best)
+        best[masks] = layer_best + is_zero[masks]
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+    return best, is_zero
+
+
+def _zero_sum_groups(best, is_zero, n):
+    """
+    Walk back from the full mask and cut the removal path at every zero-sum mask
+    """
+    groups = []
+    mask = (1 << n) - 1
+    current = []
+    while mask:
+        for i in range(n):
+            if mask >> i & 1 and best[mask & ~(1 << i)] == best[mask] - is_zero[mask]:
+                break
+        if is_zero[mask] and current:
+            groups.append(current)
+            current = []
+        current.append(i)
+        mask &= ~(1 << i)
+    groups.append(current)
+    return groups
+
+
+def calculate_optimal_settlement(people, paid_amounts, person_totals, max_people=20, time_budget=0.5):
+    """
+    Settle the bill with the fewest possible transactions
+    Finds the largest split of people into zero-sum subgroups; each subgroup of k people needs k-1 transfers
+    Falls back to a greedy pass when more than max_people have a balance
+    or the DP runs past time_budget seconds
+    Returns (transactions, proven_optimal)
+    """
+    return settle_net_paise(people, _net_paise(paid_amounts, person_totals), max_people, time_budget)
+
+
+def settle_net_paise(people, net, max_people=20, time_budget=0.5):
+    """
+    calculate_optimal_settlement on each person's net balance in integer paise (positive = owes money)
+    Every transfer is matched in exact paise, so even a 1-paisa balance is settled
+    """
+    start = time.perf_counter()
+    net = np.asarray(net, dtype=np.int64)
+    active = np.flatnonzero(net)
+    balances = net[active]
+
+    if len(active) > max_people:
+        return _greedy_with_bound(people, net)
+
+    deadline = start + time_budget if time_budget is not None else None
+    table = _max_zero_sum_groups(balances, deadline) if len(active) else None
+    if table is None:
+        if len(active) == 0:
+            return [], True
+        return _greedy_with_bound(people, net)
+
+    best, is_zero = table
+    transactions = []
+    for group in _zero_sum_groups(best, is_zero, len(active)):
+        # The two-pointer pass settles a zero-sum group of k people in at most k-1 transfers
+        group_people = [people[active[i]] for i in group]
+        transactions.extend(_iter_paise_transfers(group_people, balances[group]))
+    return transactions, True
+
+
+def _greedy_with_bound(people, net):
+    """
+    Greedy fallback; still proven optimal when it meets the max(debtors, creditors) lower bound
+    """
+    transactions = list(_iter_paise_transfers(people, net))
+    lower_bound = max(int((net > 0).sum()), int((net < 0).sum()))
+    return transactions, len(transactions) <= lower_bound
+
+
+def iter_settlement_transactions(people, paid_amounts, person_totals):
+    """
+    Streaming settlement for very large groups
+    Sorts debtors and creditors once (O(n log n)) and yields (from_person, to_person, amount)
+    lazily, so the transactions can be written out without holding them all in memory
+    Balances are matched in integer paise, largest debtor to largest creditor
+    """
+    return _iter_paise_transfers(people, _net_paise(paid_amounts, person_totals))
+
+
+def _iter_paise_transfers(people, net):
+    """
+    Two-pointer settlement of net paise balances; amounts are converted to rupees only when yielded
+    """
+    net = np.asarray(net, dtype=np.int64)
+
+    debtors = np.flatnonzero(net > 0)
+    debtors = debtors[np.argsort(-net[debtors], kind="stable")]
+    creditors = np.flatnonzero(net < 0)
+    creditors = creditors[np.argsort(net[creditors], kind="stable")]
+
+    debts = net[debtors].tolist()
+    credits = (-net[creditors]).tolist()
+    debtors = debtors.tolist()
+    creditors = creditors.tolist()
+
+    debtor_idx = 0
+    creditor_idx = 0
+    while debtor_idx < len(debts) and creditor_idx < len(credits):
+        amount = min(debts[debtor_idx], credits[creditor_idx])
+        yield (people[debtors[debtor_idx]], people[creditors[creditor_idx]], amount / 100)
+
+        debts[debtor_idx] -= amount
+        credits[creditor_idx] -= amount
+        if debts[debtor_idx] == 0:
+            debtor_idx += 1
+        if credits[creditor_idx] == 0:
+            creditor_idx += 1
+
+
+class GroupBalances:
+    """
+    Running net balance (integer paise, positive = owes money) per person across a group's bills
+    Adding or removing a bill touches only that bill's people; settle() nets every bill at once
+    """
+
+    def __init__(self):
+        self.people = []
+        self._index = {}
+        self._net = np.zeros(8, dtype=np.int64)
+        self._bills = {}
+
+    def _indices(self, people):
+        indices = []
+        for person in people:
+            idx = self._index.get(person)
+            if idx is None:
+                idx = self._index[person] = len(self.people)
+                self.people.append(person)
+                if idx >= len(self._net):
+                    self._net = np.concatenate([self._net, np.zeros(len(self._net), dtype=np.int64)])
+            indices.append(idx)
+        return np.asarray(indices, dtype=np.intp)
+
+    def add_net(self, bill_id, people, net_paise):
+        """
+        Add a bill given as each person's net paise (positive = owes money)
+        """
+        if bill_id in self._bills:
+            raise ValueError(f"Bill {bill_id} is already in this group")
+        indices = self._indices(people)
+        net_paise = np.asarray(net_paise, dtype=np.int64)
+        np.add.at(self._net, indices, net_paise)
+        self._bills[bill_id] = (indices, net_paise)
+
+    def add_bill(self, bill_id, people, paid_amounts, person_totals):
+        self.add_net(bill_id, people, _net_paise(paid_amounts, person_totals))
+
+    def remove_bill(self, bill_id):
+        indices, net_paise = self._bills.pop(bill_id)
+        np.subtract.at(self._net, indices, net_paise)
+
+    def __contains__(self, bill_id):
+        return bill_id in self._bills
+
+    def __len__(self):
+        return len(self._bills)
+
+    def net_paise(self):
+        return self._net[:len(self.people)].copy()
+
+    def balances(self):
+        """
+        {person: rupees} for everyone with a balance (positive = owes money)
+        """
+        net = self._net[:len(self.people)]
+        return {self.people[i]: int(net[i]) / 100 for i in np.flatnonzero(net)}
+
+    def settle(self, max_people=20, time_budget=0.5):
+        """
+        One consolidated settlement for all of the group's bills
+        Returns (transactions, proven_optimal) like calculate_optimal_settlement
+        """
+        return settle_net_paise(self.people, self.net_paise(), max_people=max_people, time_budget=time_budget)
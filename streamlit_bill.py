@@ -1,79 +1,158 @@
+import copy
+import io
+
+import numpy as np
 import streamlit as st
 import pandas as pd
 
+from bill_cache import cache_stats, memoize
+from bill_engine import (
+    IncrementalSplit, as_sparse_weights, as_weight_matrix, compute_split, from_paise, is_sparse,
+    parse_bill_matrix, to_paise, values_at,
+)
+from bill_export import export_archive, export_tables, iter_csv_export
+from bill_ledger import BillLedger
+from bill_trace import end_rerun, phase, phase_samples, start_rerun, traces_jsonl, trace_history
+from excel_writer import XLSX_MIME, excel_bytes
+from settlement import calculate_optimal_settlement, settle_net_paise
+
 st.set_page_config(page_title="Bill Splitter - Interactive", layout="wide")
 
-def calculate_bill_split(people, items, final_prices, weights):
+@memoize(maxsize=64, ttl=600)
+def calculate_bill_split(people, items, final_prices, weights, mode="float"):
     """
     Calculate bill split based on weighted distribution
+    Returns {person: [split per item]}; use bill_engine.compute_split for the raw arrays
+    mode="paise" returns exact integer paise that add up to each item's price
     """
-    # Calculate weighted splits for each person-item combination
-    splits = {}
-    for person_idx, person in enumerate(people):
-        splits[person] = []
-        for item_idx, item in enumerate(items):
-            if len(weights) > item_idx and len(weights[item_idx]) > person_idx:
-                weight = weights[item_idx][person_idx]
-                # Sum of all weights for this item
-                total_weight = sum(weights[item_idx]) if weights[item_idx] else 0
-                
-                # Weighted split formula: (weight/total_weight) * final_price
-                if total_weight > 0:
-                    split_amount = (weight / total_weight) * final_prices[item_idx]
-                else:
-                    split_amount = 0
-            else:
-                split_amount = 0
-            splits[person].append(split_amount)
-    
-    return splits
+    result = compute_split(final_prices[:len(items)], weights, n_people=len(people), mode=mode)
+    splits = result.splits
+    if is_sparse(splits):
+        # Sparse weights split in sparse form; only the per-person lists returned here are dense
+        splits = as_weight_matrix(splits, len(items), len(people)).astype(splits.values.dtype)
+    return {person: splits[:, person_idx].tolist() for person_idx, person in enumerate(people)}
+
+# Settlement is cached on (people, payments, totals); the exact solver can use its full time budget
+bill_workbook = memoize(maxsize=32, ttl=300, name="excel_bytes")(excel_bytes)
+settle_bill = memoize(maxsize=128, ttl=600, name="calculate_optimal_settlement")(calculate_optimal_settlement)
+# Keyed on the group's net paise, so reruns with unchanged balances skip the DP
+settle_balances = memoize(maxsize=64, ttl=600, name="settle_net_paise")(settle_net_paise)
 
-def calculate_settlement_transactions(people, paid_amounts, person_totals):
+def _editor_slot(delta, base_rows, slot):
     """
-    Calculate who should pay whom to settle the bill
-    Returns a list of transactions: (from_person, to_person, amount)
+    Current contents of one editor slot (original rows first, then added rows), or None if gone
     """
-    # Calculate net amounts (positive = owes money, negative = should receive money)
-    net_amounts = {}
-    for i, person in enumerate(people):
-        net_amounts[person] = person_totals[i] - paid_amounts[i]
-    
-    # Separate people who owe money from those who should receive money
-    debtors = {person: amount for person, amount in net_amounts.items() if amount > 0}
-    creditors = {person: -amount for person, amount in net_amounts.items() if amount < 0}
-    
-    transactions = []
-    
-    # Sort by amounts to make settling more efficient
-    debtors_sorted = sorted(debtors.items(), key=lambda x: x[1], reverse=True)
-    creditors_sorted = sorted(creditors.items(), key=lambda x: x[1], reverse=True)
-    
-    debtor_idx = 0
-    creditor_idx = 0
-    
-    while debtor_idx < len(debtors_sorted) and creditor_idx < len(creditors_sorted):
-        debtor_name, debt_amount = debtors_sorted[debtor_idx]
-        creditor_name, credit_amount = creditors_sorted[creditor_idx]
-        
-        # Calculate transaction amount
-        transaction_amount = min(debt_amount, credit_amount)
-        
-        if transaction_amount > 0.01:  # Only include transactions > 1 paisa
-            transactions.append((debtor_name, creditor_name, transaction_amount))
+    if slot in delta["deleted_rows"]:
+        return None
+    if slot < len(base_rows):
+        row = dict(base_rows[slot])
+        row.update(delta["edited_rows"].get(slot, {}))
+        return row
+    added_idx = slot - len(base_rows)
+    if added_idx < len(delta["added_rows"]):
+        return dict(delta["added_rows"][added_idx])
+    return None
+
+def _changed_editor_slots(delta, previous, n_base):
+    """
+    Slots whose contents differ between two data_editor deltas
+    """
+    changed = set()
+    for slot in set(delta["edited_rows"]) | set(previous["edited_rows"]):
+        if delta["edited_rows"].get(slot) != previous["edited_rows"].get(slot):
+            changed.add(slot)
+    added, previous_added = delta["added_rows"], previous["added_rows"]
+    for added_idx in range(max(len(added), len(previous_added))):
+        current = added[added_idx] if added_idx < len(added) else None
+        before = previous_added[added_idx] if added_idx < len(previous_added) else None
+        if current != before:
+            changed.add(n_base + added_idx)
+    changed |= set(delta["deleted_rows"]) ^ set(previous["deleted_rows"])
+    return sorted(changed)
+
+def sync_split_state(editor_key, matrix_df, people_names):
+    """
+    Bring the incremental split state in line with the data_editor's edit delta
+    Only the slots that changed since the previous rerun are parsed and re-split
+    """
+    state_key = f"split_state_{editor_key}"
+    base_rows = matrix_df.to_dict('records')
+    delta = st.session_state.get(editor_key) or {"edited_rows": {}, "added_rows": [], "deleted_rows": []}
+    delta = {
+        "edited_rows": dict(delta["edited_rows"]),
+        "added_rows": list(delta["added_rows"]),
+        "deleted_rows": list(delta["deleted_rows"]),
+    }
+
+    cached = st.session_state.get(state_key)
+    if cached is None or cached["people"] != list(people_names):
+        # New matrix layout: start from the original rows and treat every edit as new
+        split_state = IncrementalSplit(len(people_names))
+        previous = {"edited_rows": {}, "added_rows": [], "deleted_rows": []}
+        slots = sorted(set(range(len(base_rows))) | set(_changed_editor_slots(delta, previous, len(base_rows))))
+    else:
+        split_state = cached["split"]
+        previous = cached["delta"]
+        slots = _changed_editor_slots(delta, previous, len(base_rows))
+
+    if slots:
+        with phase("matrix parsing"):
+            changed_rows = pd.DataFrame(
+                [_editor_slot(delta, base_rows, slot) or {} for slot in slots],
+                columns=matrix_df.columns,
+            )
+            names, prices, row_weights = parse_bill_matrix(changed_rows, people_names, keep_blank=True)
+        with phase("splitting"):
+            split_state.update_rows(slots, names, prices, row_weights)
+
+    st.session_state[state_key] = {
+        "people": list(people_names),
+        "split": split_state,
+        "delta": copy.deepcopy(delta),
+    }
+    return split_state
+
+def group_ledger_view(ledger, group_name, days=90):
+    """
+    The group's per-person summary over the last days and its consolidated settlement
+    A blank group_name means the bills saved without a group, for both
+    """
+    balances = ledger.group_balances(group_name)
+    settlement = settle_balances(balances.people, balances.net_paise(), time_budget=0.5)
+    return ledger.person_summary(days, group=group_name), settlement
+
+def show_debug_panel(record):
+    """
+    Per-rerun phase timings, histograms over recent reruns and cache counters (open with ?debug=1)
+    """
+    with st.expander("🛠️ Performance (debug)"):
+        if record is None:
+            return
+        st.write(f"**This rerun:** {record['total'] * 1000:.1f} ms")
+        st.dataframe(pd.DataFrame({
+            "Phase": list(record["phases"]),
+            "ms": [seconds * 1000 for seconds in record["phases"].values()],
+        }), hide_index=True)
         
-        # Update amounts
-        debtors_sorted[debtor_idx] = (debtor_name, debt_amount - transaction_amount)
-        creditors_sorted[creditor_idx] = (creditor_name, credit_amount - transaction_amount)
+        st.write(f"**Last {len(trace_history())} traced reruns:**")
+        for name, samples in phase_samples().items():
+            counts, edges = np.histogram(np.array(samples) * 1000, bins=10)
+            st.caption(f"{name}: median {np.median(samples) * 1000:.2f} ms, max {max(samples) * 1000:.2f} ms")
+            st.bar_chart(pd.DataFrame({"reruns": counts}, index=[f"{edge:.2f}" for edge in edges[:-1]]))
         
-        # Move to next debtor/creditor if current one is settled
-        if debtors_sorted[debtor_idx][1] <= 0.01:
-            debtor_idx += 1
-        if creditors_sorted[creditor_idx][1] <= 0.01:
-            creditor_idx += 1
-    
-    return transactions
+        st.write("**Caches:**")
+        st.dataframe(pd.DataFrame(cache_stats()).T)
+        st.download_button(
+            label="Download traces (JSON lines)",
+            data=traces_jsonl(),
+            file_name="bill_traces.jsonl",
+            mime="application/x-ndjson",
+        )
 
 def main():
+    debug = st.query_params.get("debug") == "1"
+    start_rerun(debug)
+    
     st.title("🧾 Interactive Bill Splitter")
     st.markdown("*Split bills fairly with weighted distribution*")
     st.markdown("---")
@@ -165,49 +244,23 @@ def main():
     st.markdown("• **Weights:** 0 = doesn't pay, 1 = normal share, 2 = double share, 3 = triple share")
     st.markdown(f"**📊 Current Matrix:** {num_people} people × items (add rows as needed)")
     
+    editor_key = f"main_matrix_people_{num_people}"  # Unique key for different number of people
     edited_matrix = st.data_editor(
         matrix_df,
         column_config=column_config,
         use_container_width=True,
         hide_index=True,
         num_rows="dynamic",  # Allow adding/removing rows (items)
-        key=f"main_matrix_people_{num_people}"  # Unique key for different number of people
+        key=editor_key
     )
     
     # Process the matrix to extract data (new format: rows=items, columns=people)
     if not edited_matrix.empty and len(edited_matrix) >= 1:
-        # Extract items and prices from each row
-        items = []
-        final_prices = []
-        
-        for idx, row in edited_matrix.iterrows():
-            item_name = str(row['Item']).strip()
-            if item_name and item_name.lower() != 'nan':  # Only include non-empty items
-                items.append(item_name)
-                
-                # Extract price
-                try:
-                    price = float(row['Price (₹)']) if pd.notna(row['Price (₹)']) and row['Price (₹)'] != '' else 0
-                    final_prices.append(max(0, price))  # Ensure non-negative
-                except:
-                    final_prices.append(0)
-        
-        # Extract people names and weights
+        # Only the rows touched since the last rerun are parsed and re-split
+        split_state = sync_split_state(editor_key, matrix_df, people_names)
+        with phase("splitting"):
+            items, final_prices, weights, split_result = split_state.snapshot()
         people = people_names  # Use the names entered by user
-        weights = []
-        
-        # For each item, get weights for all people
-        for idx, row in edited_matrix.iterrows():
-            item_name = str(row['Item']).strip()
-            if item_name and item_name.lower() != 'nan':  # Only process rows with valid items
-                item_weights = []
-                for person_name in people_names:
-                    try:
-                        weight = float(row[person_name]) if pd.notna(row[person_name]) and row[person_name] != '' else 0
-                        item_weights.append(max(0, weight))  # Ensure non-negative
-                    except:
-                        item_weights.append(0)
-                weights.append(item_weights)
         
         # Display summary
         if items and people:
@@ -234,54 +287,58 @@ def main():
         
         # Calculate splits if we have valid data
         if items and people and any(sum(w) > 0 for w in weights):
-            # Calculate individual splits using the optimized function
-            splits = calculate_bill_split(people, items, final_prices, weights)
+            # Splits come from the incremental paise engine (items x people)
+            # Paise mode keeps every item column summing exactly to its price
+            splits = from_paise(split_result.splits)
+            item_totals_paise = split_result.item_totals
             
             st.markdown("---")
             st.subheader("💸 Bill Split Results")
             
             # Create main split table
-            split_data = {"Person": people}
-            for item_idx, item in enumerate(items):
-                split_data[item] = [f"₹{splits[person][item_idx]:.0f}" for person in people]
-            
-            # Add person totals
-            person_totals = [sum(splits[person]) for person in people]
-            split_data["Total Split"] = [f"₹{total:.0f}" for total in person_totals]
-            
-            split_df = pd.DataFrame(split_data)
+            with phase("summary tables"):
+                split_data = {"Person": people}
+                for item_idx, item in enumerate(items):
+                    split_data[item] = [f"₹{amount:.2f}" for amount in splits[item_idx]]
+                
+                # Add person totals
+                person_totals = from_paise(split_result.person_totals).tolist()
+                split_data["Total Split"] = [f"₹{total:.2f}" for total in person_totals]
+                
+                split_df = pd.DataFrame(split_data)
             st.dataframe(split_df, use_container_width=True, hide_index=True)
             
             # Create separate summary table for item totals and balance
             st.write("**Split Summary & Validation:**")
             
-            # Calculate item totals
-            summary_data = {"Summary": ["Item Totals", "Expected (Final Price)", "Balance"]}
-            for item_idx, item in enumerate(items):
-                item_total = sum(splits[person][item_idx] for person in people)
-                balance = final_prices[item_idx] - item_total
+            with phase("summary tables"):
+                # Item totals and balances are integer paise, so the checks are exact
+                item_balances = to_paise(final_prices) - item_totals_paise
+                summary_data = {"Summary": ["Item Totals", "Expected (Final Price)", "Balance"]}
+                for item_idx, item in enumerate(items):
+                    balance = item_balances[item_idx]
                 
-                summary_data[item] = [
-                    f"₹{item_total:.0f}",
-                    f"₹{final_prices[item_idx]:.0f}",
-                    f"₹{balance:.0f} {'✅' if abs(balance) < 1 else '❌'}"
-                ]
+                    summary_data[item] = [
+                        f"₹{item_totals_paise[item_idx] / 100:.2f}",
+                        f"₹{final_prices[item_idx]:.2f}",
+                        f"₹{balance / 100:.2f} {'✅' if balance == 0 else '❌'}"
+                    ]
             
-            # Add total column
-            total_split_amount = sum(person_totals)
-            total_bill = sum(final_prices)
-            overall_balance = total_bill - total_split_amount
-            summary_data["Total Split"] = [
-                f"₹{total_split_amount:.0f}",
-                f"₹{total_bill:.0f}",
-                f"₹{overall_balance:.0f} {'✅' if abs(overall_balance) < 1 else '❌'}"
-            ]
+                # Add total column
+                total_split_paise = int(split_result.person_totals.sum())
+                total_bill = sum(final_prices)
+                overall_balance = int(to_paise(total_bill)) - total_split_paise
+                summary_data["Total Split"] = [
+                    f"₹{total_split_paise / 100:.2f}",
+                    f"₹{total_bill:.2f}",
+                    f"₹{overall_balance / 100:.2f} {'✅' if overall_balance == 0 else '❌'}"
+                ]
             
-            summary_df = pd.DataFrame(summary_data)
+                summary_df = pd.DataFrame(summary_data)
             st.dataframe(summary_df, use_container_width=True, hide_index=True)
             
             # Quick validation summary
-            if abs(overall_balance) < 1:
+            if overall_balance == 0:
                 st.success("✅ All amounts properly allocated!")
             else:
                 st.error("❌ Balance mismatch detected")
@@ -314,14 +371,16 @@ def main():
             # Display settlement summary
             st.markdown("---")
             st.subheader("📊 Final Settlement Summary")
-            settlement_data = {
-                "👤 Person": people,
-                "💸 Paid": [f"₹{paid:.0f}" for paid in paid_amounts],
-                "🎯 Should Pay": [f"₹{total:.0f}" for total in person_totals],
-                "⚖️ Balance": [f"₹{paid - total:.0f}" for paid, total in zip(paid_amounts, person_totals)]
-            }
+            with phase("summary tables"):
+                settlement_data = {
+                    "👤 Person": people,
+                    "💸 Paid": [f"₹{paid:.0f}" for paid in paid_amounts],
+                    "🎯 Should Pay": [f"₹{total:.0f}" for total in person_totals],
+                    "⚖️ Balance": [f"₹{paid - total:.0f}" for paid, total in zip(paid_amounts, person_totals)]
+                }
+                settlement_df = pd.DataFrame(settlement_data)
             
-            st.dataframe(pd.DataFrame(settlement_data), use_container_width=True, hide_index=True)
+            st.dataframe(settlement_df, use_container_width=True, hide_index=True)
             
             # Summary
             total_paid = sum(paid_amounts)
@@ -335,7 +394,11 @@ def main():
             st.subheader("🔄 Settlement Transactions")
             st.info("💡 **Who needs to pay whom to settle the bill**")
             
-            transactions = calculate_settlement_transactions(people, paid_amounts, person_totals)
+            # Exact minimum-transfer solver, bounded so reruns stay fast; falls back to greedy
+            with phase("settlement"):
+                transactions, proven_optimal = settle_bill(
+                    people, paid_amounts, person_totals, time_budget=0.5
+                )
             
             if not transactions:
                 st.success("🎉 Perfect! No transactions needed - all balances are settled")
@@ -344,6 +407,10 @@ def main():
                 # Format the amount column
                 transaction_df["💵 Amount (₹)"] = transaction_df["💵 Amount (₹)"].apply(lambda x: f"₹{x:.0f}")
                 st.dataframe(transaction_df, use_container_width=True, hide_index=True)
+                if proven_optimal:
+                    st.caption(f"✅ {len(transactions)} transfers - the fewest possible for this bill")
+                else:
+                    st.caption(f"ℹ️ {len(transactions)} transfers - quick settlement (fewest not guaranteed)")
                 
                 # Instructions for using the transaction table
                 with st.expander("📖 How to Use These Transactions"):
@@ -367,10 +434,11 @@ def main():
                 st.info("💬 **Copy & paste this summary to share with your friends on WhatsApp**")
                 
                 # Generate WhatsApp-friendly text summary
-                whatsapp_summary = generate_whatsapp_summary(
-                    items, final_prices, people, person_totals, 
-                    paid_amounts, transactions, total_bill
-                )
+                with phase("whatsapp summary"):
+                    whatsapp_summary = generate_whatsapp_summary(
+                        items, final_prices, people, person_totals, 
+                        paid_amounts, transactions, total_bill
+                    )
                 
                 # Display the summary in a text area for easy copying
                 st.text_area(
@@ -391,19 +459,21 @@ def main():
                     **{item: weights[i] for i, item in enumerate(items)}
                 })
                 
-                # Generate detailed export content
-                detailed_summary = generate_detailed_export(
-                    items, final_prices, people, person_totals, paid_amounts, 
-                    transactions, total_bill, export_weights, weights
+                # The full detailed export is only built when its download is clicked; reruns render the preview
+                detailed_args = (
+                    items, final_prices, people, person_totals, paid_amounts,
+                    transactions, total_bill, export_weights, weights, splits
                 )
+                with phase("detailed export"):
+                    detailed_preview = preview_detailed_export(*detailed_args)
                 
-                col1, col2 = st.columns(2)
+                col1, col2, col3 = st.columns(3)
                 
                 with col1:
                     # Text file download
                     st.download_button(
                         label="📄 Download as Text File",
-                        data=detailed_summary,
+                        data=lambda: generate_detailed_export(*detailed_args),
                         file_name=f"bill_split_summary_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.txt",
                         mime="text/plain",
                         help="Download a detailed text file with all bill split information"
@@ -411,7 +481,8 @@ def main():
                 
                 with col2:
                     # CSV export button
-                    csv_data = generate_csv_export(items, final_prices, people, person_totals, paid_amounts, export_weights)
+                    with phase("csv export"):
+                        csv_data = generate_csv_export(items, final_prices, people, person_totals, paid_amounts, export_weights)
                     st.download_button(
                         label="📊 Download as Excel/CSV",
                         data=csv_data,
@@ -419,10 +490,80 @@ def main():
                         mime="text/csv",
                         help="Download bill data in spreadsheet format for analysis"
                     )
+                
+                with col3:
+                    # Excel workbook built in memory, formulas kept with their results cached
+                    with phase("excel export"):
+                        workbook_data = bill_workbook(
+                            people, items, final_prices=final_prices, weights=weights,
+                            paid_amounts=paid_amounts, values="cached"
+                        )
+                    st.download_button(
+                        label="📗 Download as Excel Workbook",
+                        data=workbook_data,
+                        file_name=f"bill_split_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                        mime=XLSX_MIME,
+                        help="Download the bill as a live Excel sheet with the split already filled in"
+                    )
+                
+                # Analytics formats: one typed table per file
+                with st.expander("📦 Parquet / Arrow export (for analytics)"):
+                    table_format = st.radio("Format", ["parquet", "arrow"], horizontal=True)
+                    with phase("table export"):
+                        table_data = generate_table_export(
+                            items, final_prices, people, person_totals, paid_amounts, export_weights, table_format
+                        )
+                    st.download_button(
+                        label=f"📦 Download {table_format.title()} tables",
+                        data=table_data,
+                        file_name=f"bill_split_{table_format}_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                        mime="application/zip",
+                        help="Summary, items, weights and split as separate typed tables"
+                    )
                   # Preview of detailed summary
                 with st.expander("🔍 Preview Detailed Summary"):
-                    st.text_area("Preview of the detailed export file:", value=detailed_summary, height=300, disabled=True)
+                    st.text_area("Preview of the detailed export file:", value=detailed_preview, height=300, disabled=True)
+            
+            # Bill ledger: keep this bill for the group's history
+            st.markdown("---")
+            st.subheader("📒 Bill Ledger")
+            ledger = BillLedger()
+            ledger_col1, ledger_col2 = st.columns(2)
+            with ledger_col1:
+                group_name = st.text_input("👥 Group", value="", help="Bills saved under the same group are tracked together")
+            with ledger_col2:
+                bill_name = st.text_input("🏷️ Bill name", value="", help="e.g. Friday dinner")
+            
+            if st.button("💾 Save Bill"):
+                with phase("ledger save"):
+                    bill_id = ledger.save_bill(
+                        people, items, final_prices, weights, paid_amounts, transactions,
+                        group=group_name, name=bill_name, splits_paise=split_result.splits
+                    )
+                st.success(f"✅ Saved bill #{bill_id} to the ledger")
+            
+            # A blank group means the bills saved without one, here and in the settlement below
+            with phase("group settlement"):
+                group_summary, (group_transactions, group_optimal) = group_ledger_view(ledger, group_name)
+            
+            with st.expander(f"📈 Last 90 days {'for ' + group_name if group_name else 'of bills without a group'}"):
+                st.dataframe(group_summary, use_container_width=True, hide_index=True)
+            
+            # Every saved bill in the group netted into one round of transfers
+            with st.expander("🤝 Settle all of this group's saved bills at once"):
+                if not group_transactions:
+                    st.success("🎉 No transfers needed - the group's saved bills are all square")
+                else:
+                    group_df = pd.DataFrame(group_transactions, columns=["💸 From", "💰 To", "💵 Amount (₹)"])
+                    group_df["💵 Amount (₹)"] = group_df["💵 Amount (₹)"].apply(lambda x: f"₹{x:.2f}")
+                    st.dataframe(group_df, use_container_width=True, hide_index=True)
+                    st.caption(f"{'✅' if group_optimal else 'ℹ️'} {len(group_transactions)} transfers settle every saved bill in the group")
+    
+    record = end_rerun()
+    if debug:
+        show_debug_panel(record)
 
+@memoize(maxsize=32, ttl=300)
 def generate_whatsapp_summary(items, final_prices, people, person_totals, paid_amounts, transactions, total_bill):
     """
     Generate a WhatsApp-friendly text summary of the bill split
@@ -460,104 +601,85 @@ def generate_whatsapp_summary(items, final_prices, people, person_totals, paid_a
     
     return summary
 
-def generate_detailed_export(items, final_prices, people, person_totals, paid_amounts, transactions, total_bill, edited_weights, weights):
+RULE = "═" * 79
+PREVIEW_CHARS = 20000  # characters of the detailed export shown in the preview box
+
+def _section(title, indent):
+    return f"""
+{RULE}
+{' ' * indent}{title}
+{RULE}
+"""
+
+def iter_detailed_export(items, final_prices, people, person_totals, paid_amounts, transactions, total_bill, edited_weights, weights, splits=None):
     """
-    Generate a comprehensive detailed export of the bill split
+    Yield the detailed export report chunk by chunk (write to a file, or join for a download)
+    splits is the items x people split matrix from main(); without it the split engine runs once here
+    weights and splits may be dense or sparse; the breakdown only visits the non-zero weights
     """
     timestamp = pd.Timestamp.now().strftime('%d %B %Y, %I:%M %p')
+    n_people = len(people)
+    shares = as_sparse_weights(weights, len(items), n_people)
+    if splits is None:
+        amounts = compute_split(final_prices[:len(items)], shares, n_people=n_people).splits.values
+    else:
+        amounts = values_at(splits, shares).astype(float)
+    weight_sums = np.bincount(shares.items, shares.values, minlength=len(items))
     
-    summary = f"""
+    # Group the shares by person; within a person they stay in item order
+    by_person = np.argsort(shares.people, kind="stable")
+    person_bounds = np.searchsorted(shares.people[by_person], np.arange(n_people + 1))
+    
+    yield f"""
 ╔══════════════════════════════════════════════════════════════════════════════╗
 ║                           DETAILED BILL SPLIT SUMMARY                        ║
 ╚══════════════════════════════════════════════════════════════════════════════╝
 
 📅 Generated: {timestamp}
 🧾 Total Bill Amount: ₹{total_bill:.2f}
-👥 Number of People: {len(people)}
+👥 Number of People: {n_people}
 🛒 Number of Items: {len(items)}
-
-═══════════════════════════════════════════════════════════════════════════════
-                                  PARTICIPANTS
-═══════════════════════════════════════════════════════════════════════════════
-{', '.join(people)}
-
-═══════════════════════════════════════════════════════════════════════════════
-                                 BILL BREAKDOWN
-═══════════════════════════════════════════════════════════════════════════════
-"""
-    
-    for i, (item, price) in enumerate(zip(items, final_prices)):
-        summary += f"{i+1:2d}. {item:<30} ₹{price:>8.2f}\n"
-    
-    summary += f"\n{'Total Bill Amount:':<32} ₹{total_bill:>8.2f}\n"
-    
-    # Weight Matrix
-    summary += f"""
-═══════════════════════════════════════════════════════════════════════════════
-                               WEIGHT ASSIGNMENT MATRIX
-═══════════════════════════════════════════════════════════════════════════════
 """
+    yield _section("PARTICIPANTS", 34)
+    yield ', '.join(people) + "\n"
+    
+    yield _section("BILL BREAKDOWN", 33)
+    yield "".join(f"{i+1:2d}. {item:<30} ₹{price:>8.2f}\n" for i, (item, price) in enumerate(zip(items, final_prices)))
+    yield f"\n{'Total Bill Amount:':<32} ₹{total_bill:>8.2f}\n"
+    
+    # Weight Matrix, read column by column instead of cell by cell
+    yield _section("WEIGHT ASSIGNMENT MATRIX", 31)
+    columns = [edited_weights[item].to_numpy() for item in items]
+    header = f"{'Person':<15}" + "".join(f"{item[:10]:<12}" for item in items)
+    yield header + "\n" + "─" * len(header) + "\n"
+    yield "".join(
+        f"{person:<15}" + "".join(f"{column[person_idx]:<12}" for column in columns) + "\n"
+        for person_idx, person in enumerate(people)
+    )
+    yield "─" * len(header) + "\n"
+    yield f"{'TOTALS:':<15}" + "".join(f"{column.sum():<12}" for column in columns) + "\n"
     
-    # Header for weight matrix
-    header = f"{'Person':<15}"
-    for item in items:
-        header += f"{item[:10]:<12}"
-    summary += header + "\n" + "─" * len(header) + "\n"
-    
-    # Weight matrix rows
+    # Individual Split Details, straight from the split matrix
+    yield _section("INDIVIDUAL SPLIT BREAKDOWN", 30)
     for person_idx, person in enumerate(people):
-        row = f"{person:<15}"
-        for item in items:
-            weight = edited_weights.loc[person_idx, item]
-            row += f"{weight:<12}"
-        summary += row + "\n"
-    
-    # Weight totals
-    summary += "─" * len(header) + "\n"
-    totals_row = f"{'TOTALS:':<15}"
-    for item in items:
-        total_weight = sum(edited_weights[item])
-        totals_row += f"{total_weight:<12}"
-    summary += totals_row + "\n"
-    
-    # Individual Split Details
-    summary += f"""
-═══════════════════════════════════════════════════════════════════════════════
-                              INDIVIDUAL SPLIT BREAKDOWN
-═══════════════════════════════════════════════════════════════════════════════
-"""
-    
-    for person_idx, person in enumerate(people):
-        summary += f"\n🧑 {person.upper()}:\n"
-        summary += "─" * 50 + "\n"
-        person_total = 0
-        
-        for item_idx, item in enumerate(items):
-            weight = weights[item_idx][person_idx]
-            total_weight = sum(weights[item_idx])
-            if total_weight > 0:
-                split_amount = (weight / total_weight) * final_prices[item_idx]
-            else:
-                split_amount = 0
-            person_total += split_amount
-            
-            if weight > 0:
-                percentage = (weight / total_weight * 100) if total_weight > 0 else 0
-                summary += f"  {item:<25} Weight: {weight:<3} ({percentage:5.1f}%) → ₹{split_amount:>7.2f}\n"
-        
-        summary += "─" * 50 + "\n"
-        summary += f"  {'TOTAL FOR ' + person.upper():<35} → ₹{person_total:>7.2f}\n"
+        lines = [f"\n🧑 {person.upper()}:\n", "─" * 50 + "\n"]
+        entries = by_person[person_bounds[person_idx]:person_bounds[person_idx + 1]]
+        for entry in entries:
+            weight = shares.values[entry]
+            if weight <= 0:
+                continue
+            item_idx = shares.items[entry]
+            percentage = weight / weight_sums[item_idx] * 100
+            lines.append(f"  {items[item_idx]:<25} Weight: {weight:<3} ({percentage:5.1f}%) → ₹{amounts[entry]:>7.2f}\n")
+        lines.append("─" * 50 + "\n")
+        lines.append(f"  {'TOTAL FOR ' + person.upper():<35} → ₹{amounts[entries].sum():>7.2f}\n")
+        yield "".join(lines)
     
     # Payment Summary
-    summary += f"""
-═══════════════════════════════════════════════════════════════════════════════
-                                PAYMENT SUMMARY
-═══════════════════════════════════════════════════════════════════════════════
-"""
-    
-    summary += f"{'Person':<15} {'Should Pay':<12} {'Actually Paid':<15} {'Balance':<12} {'Status'}\n"
-    summary += "─" * 75 + "\n"
-    
+    yield _section("PAYMENT SUMMARY", 32)
+    yield f"{'Person':<15} {'Should Pay':<12} {'Actually Paid':<15} {'Balance':<12} {'Status'}\n"
+    yield "─" * 75 + "\n"
+    lines = []
     for i, person in enumerate(people):
         should_pay = person_totals[i]
         paid = paid_amounts[i]
@@ -570,89 +692,83 @@ def generate_detailed_export(items, final_prices, people, person_totals, paid_am
         else:
             status = f"💸 GETS ₹{balance:.2f}"
         
-        summary += f"{person:<15} ₹{should_pay:<11.2f} ₹{paid:<14.2f} ₹{balance:<11.2f} {status}\n"
+        lines.append(f"{person:<15} ₹{should_pay:<11.2f} ₹{paid:<14.2f} ₹{balance:<11.2f} {status}\n")
+    yield "".join(lines)
     
     # Settlement Transactions
+    yield _section("SETTLEMENT TRANSACTIONS", 30)
     if transactions:
-        summary += f"""
-═══════════════════════════════════════════════════════════════════════════════
-                              SETTLEMENT TRANSACTIONS
-═══════════════════════════════════════════════════════════════════════════════
-💡 Complete these transactions to settle all balances:
-
-"""
-        for i, (from_person, to_person, amount) in enumerate(transactions):
-            summary += f"{i+1}. {from_person} → {to_person}: ₹{amount:.2f}\n"
+        yield "💡 Complete these transactions to settle all balances:\n\n"
+        yield "".join(
+            f"{i+1}. {from_person} → {to_person}: ₹{amount:.2f}\n"
+            for i, (from_person, to_person, amount) in enumerate(transactions)
+        )
     else:
-        summary += f"""
-═══════════════════════════════════════════════════════════════════════════════
-                              SETTLEMENT TRANSACTIONS
-═══════════════════════════════════════════════════════════════════════════════
-🎉 NO TRANSACTIONS NEEDED - ALL BALANCES ARE SETTLED!
-"""
-    
-    summary += f"""
-═══════════════════════════════════════════════════════════════════════════════
-                                   SUMMARY
-═══════════════════════════════════════════════════════════════════════════════
-Total Bill Amount:     ₹{total_bill:.2f}
-Total Amount Split:    ₹{sum(person_totals):.2f}
-Total Amount Paid:     ₹{sum(paid_amounts):.2f}
-Balance Verification:  {'✅ VERIFIED' if abs(total_bill - sum(person_totals)) < 0.01 else '❌ MISMATCH'}
-Payment Verification:  {'✅ VERIFIED' if abs(sum(paid_amounts) - total_bill) < 0.01 else '❌ MISMATCH'}
+        yield "🎉 NO TRANSACTIONS NEEDED - ALL BALANCES ARE SETTLED!\n"
+    
+    total_split = sum(person_totals)
+    total_paid = sum(paid_amounts)
+    yield _section("SUMMARY", 35)
+    yield f"""Total Bill Amount:     ₹{total_bill:.2f}
+Total Amount Split:    ₹{total_split:.2f}
+Total Amount Paid:     ₹{total_paid:.2f}
+Balance Verification:  {'✅ VERIFIED' if abs(total_bill - total_split) < 0.01 else '❌ MISMATCH'}
+Payment Verification:  {'✅ VERIFIED' if abs(total_paid - total_bill) < 0.01 else '❌ MISMATCH'}
 
-═══════════════════════════════════════════════════════════════════════════════
+{RULE}
 Generated by Interactive Bill Splitter
 📅 {timestamp}
-═══════════════════════════════════════════════════════════════════════════════
+{RULE}
 """
-    
-    return summary
 
+def write_detailed_export(file, *args, **kwargs):
+    """
+    Stream the detailed export into a binary file as UTF-8, one chunk at a time
+    """
+    for chunk in iter_detailed_export(*args, **kwargs):
+        file.write(chunk.encode("utf-8"))
+
+def generate_detailed_export(items, final_prices, people, person_totals, paid_amounts, transactions, total_bill, edited_weights, weights, splits=None):
+    """
+    Generate a comprehensive detailed export of the bill split, as UTF-8 bytes
+    Not memoized: large groups produce tens of megabytes, so it is built only on download
+    """
+    buffer = io.BytesIO()
+    write_detailed_export(
+        buffer, items, final_prices, people, person_totals, paid_amounts,
+        transactions, total_bill, edited_weights, weights, splits
+    )
+    return buffer.getvalue()
+
+def preview_detailed_export(*args, limit=PREVIEW_CHARS, **kwargs):
+    """
+    The start of the detailed export, stopping the generator once limit characters are in
+    """
+    chunks, size = [], 0
+    for chunk in iter_detailed_export(*args, **kwargs):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            chunks.append("\n… preview truncated - download the file for the full export\n")
+            break
+    return "".join(chunks)
+
+@memoize(maxsize=32, ttl=300)
 def generate_csv_export(items, final_prices, people, person_totals, paid_amounts, edited_weights):
     """
     Generate CSV data for spreadsheet export
+    Amounts are plain numbers (no ₹) so the file loads back as numeric columns
     """
-    import io
-    
-    output = io.StringIO()
-    
-    # Write basic info
-    output.write("Bill Split Summary\n")
-    output.write(f"Generated,{pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-    output.write(f"Total Bill,₹{sum(final_prices):.2f}\n")
-    output.write("\n")
-    
-    # Write items breakdown
-    output.write("Items Breakdown\n")
-    output.write("Item,Price\n")
-    for item, price in zip(items, final_prices):
-        output.write(f"{item},₹{price:.2f}\n")
-    output.write("\n")
-    
-    # Write weight matrix
-    output.write("Weight Matrix\n")
-    header = "Person," + ",".join(items) + "\n"
-    output.write(header)
-    
-    for person_idx, person in enumerate(people):
-        row = f"{person},"
-        for item in items:
-            weight = edited_weights.loc[person_idx, item]
-            row += f"{weight},"
-        output.write(row.rstrip(',') + "\n")
-    output.write("\n")
-    
-    # Write final amounts
-    output.write("Final Split\n")
-    output.write("Person,Should Pay,Paid,Balance\n")
-    for i, person in enumerate(people):
-        should_pay = person_totals[i]
-        paid = paid_amounts[i]
-        balance = paid - should_pay
-        output.write(f"{person},₹{should_pay:.2f},₹{paid:.2f},₹{balance:.2f}\n")
-    
-    return output.getvalue()
+    tables = export_tables(items, final_prices, people, person_totals, paid_amounts, edited_weights)
+    return "".join(iter_csv_export(tables))
+
+@memoize(maxsize=16, ttl=300)
+def generate_table_export(items, final_prices, people, person_totals, paid_amounts, edited_weights, fmt="parquet"):
+    """
+    Generate a zip of Parquet or Arrow IPC tables for analytics
+    """
+    tables = export_tables(items, final_prices, people, person_totals, paid_amounts, edited_weights)
+    return export_archive(tables, fmt)
 
 if __name__ == "__main__":
     main()
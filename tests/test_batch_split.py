@@ -0,0 +1,66 @@
+import numpy as np
+
+from bill_engine import _shape_chunks, batch_split, compute_split, pad_bills
+
+BILLS = [
+    {"final_prices": [100, 50], "weights": [[1, 1, 0], [0, 2, 1]], "people": ["a", "b", "c"], "paid_amounts": [150, 0, 0]},
+    {"final_prices": [10], "weights": [[1]], "people": ["a"]},
+    ([33.33, 0, 12], [[1, 2], [1, 1], [0, 0]]),
+]
+
+
+def single(bill):
+    final_prices, weights = (bill["final_prices"], bill["weights"]) if isinstance(bill, dict) else bill
+    return compute_split(final_prices, weights)
+
+
+def test_pad_bills_keeps_each_bills_shape():
+    prices, weights, shapes = pad_bills(BILLS)
+    assert shapes == [(2, 3), (1, 1), (3, 2)]
+    assert prices.shape == (3, 3) and weights.shape == (3, 3, 3)
+    assert not weights[1, 1:].any() and not weights[1, :, 1:].any()
+
+
+def test_ragged_bills_split_like_single_bills():
+    for bill, result in zip(BILLS, batch_split(BILLS).bills):
+        expected = single(bill)
+        np.testing.assert_allclose(result["splits"], expected.splits)
+        np.testing.assert_allclose(result["person_totals"], expected.person_totals)
+        np.testing.assert_allclose(result["item_totals"], expected.item_totals)
+
+
+def test_padded_tensors_split_like_ragged_bills():
+    prices, weights, shapes = pad_bills(BILLS)
+    results = batch_split(prices=prices, weights=weights).bills
+    for (n_items, n_people), bill, result in zip(shapes, BILLS, results):
+        np.testing.assert_allclose(result["splits"][:n_items, :n_people], single(bill).splits)
+
+
+def test_chunks_and_process_pool_give_the_same_results():
+    bills = BILLS * 4
+    serial = batch_split(bills).bills
+    for results in (batch_split(bills, chunk_size=2).bills, batch_split(bills, processes=2, chunk_size=3).bills):
+        for expected, result in zip(serial, results):
+            np.testing.assert_allclose(result["splits"], expected["splits"])
+
+
+def test_only_bills_with_payments_get_transactions():
+    results = batch_split(BILLS).bills
+    transactions = results[0]["transactions"]
+    assert [(from_person, to_person) for from_person, to_person, _ in transactions] == [("b", "a"), ("c", "a")]
+    np.testing.assert_allclose([amount for _, _, amount in transactions], [250 / 3, 50 / 3])
+    assert "transactions" not in results[1] and "transactions" not in results[2]
+
+
+def test_a_large_bill_gets_its_own_chunk():
+    shapes = [(1, 2)] * 50 + [(40, 60)] + [(2, 2)] * 10
+    chunks = _shape_chunks(shapes, chunk_size=1000)
+    assert [50] in chunks
+    assert sorted(i for chunk in chunks for i in chunk) == list(range(61))
+
+
+def test_results_are_copies_in_input_order():
+    bills = [([10], [[1, 1]])] * 5 + [(np.ones(40), np.ones((40, 60)))] + [([4, 2], [[1], [1]])]
+    results = batch_split(bills).bills
+    assert [result["splits"].shape for result in results] == [(1, 2)] * 5 + [(40, 60), (2, 1)]
+    assert all(result["splits"].base is None for result in results)
@@ -0,0 +1,109 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+import bill_archive
+from bill_archive import INDEX_FILE, LOCK_FILE, BillArchive, matrix_frame
+from bill_engine import parse_bill_matrix
+
+
+def bill(name):
+    return {"name": name, "people": ["a", "b"], "items": ["Pizza", "Tax"],
+            "final_prices": [900, 33.33], "weights": [[1, 2], [1, 1]], "paid_amounts": [933.33, 0]}
+
+
+def append_bills(path, names):
+    archive = BillArchive(path)
+    for name in names:
+        archive.append([bill(name)])
+
+
+def names_in(path):
+    return sorted(BillArchive(path).listing()["name"])
+
+
+def test_bills_round_trip_into_the_split_inputs(tmp_path):
+    archive = BillArchive(str(tmp_path))
+    [bill_id] = archive.append([bill("dinner")])
+    loaded = archive.load(bill_id)
+    assert loaded["weights"] == [[1, 2], [1, 1]] and loaded["final_prices"] == [900, 33.33]
+    items, prices, weights = parse_bill_matrix(matrix_frame(loaded), loaded["people"])
+    assert items == ["Pizza", "Tax"] and prices.tolist() == [900, 33.33] and weights.tolist() == [[1, 2], [1, 1]]
+
+
+def test_two_archives_on_one_directory_keep_each_others_bills(tmp_path):
+    first, second = BillArchive(str(tmp_path)), BillArchive(str(tmp_path))
+    [first_id] = first.append([bill("first")])
+    [second_id] = second.append([bill("second")])
+
+    assert names_in(str(tmp_path)) == ["first", "second"]
+    assert second_id in first and first_id in second
+    assert first.load(second_id)["name"] == "second"
+    assert not os.path.exists(tmp_path / LOCK_FILE)
+
+
+def test_writer_processes_do_not_lose_bills(tmp_path):
+    with ProcessPoolExecutor(max_workers=3) as pool:
+        list(pool.map(append_bills, [str(tmp_path)] * 3, [[f"{w}-{i}" for i in range(5)] for w in range(3)]))
+    assert len(BillArchive(str(tmp_path))) == 15
+
+
+def test_a_segment_missing_from_the_index_is_recovered(tmp_path):
+    archive = BillArchive(str(tmp_path))
+    archive.append([bill("kept")])
+    archive.append([bill("orphaned")])
+
+    # The writer of the second segment died before updating the index
+    index_path = tmp_path / INDEX_FILE
+    index = json.loads(index_path.read_text())
+    orphan = index["segments"].pop()
+    index["bills"] = {bill_id: entry for bill_id, entry in index["bills"].items() if entry["segment"] != orphan}
+    index_path.write_text(json.dumps(index))
+
+    assert names_in(str(tmp_path)) == ["kept", "orphaned"]
+    BillArchive(str(tmp_path)).append([bill("later")])
+    assert orphan in json.loads(index_path.read_text())["segments"]
+    assert names_in(str(tmp_path)) == ["kept", "later", "orphaned"]
+
+
+def write_lock(path, owner, age=0):
+    lock_path = os.path.join(path, LOCK_FILE)
+    with open(lock_path, "w", encoding="utf-8") as file:
+        file.write(owner)
+    os.utime(lock_path, (time.time() - age, time.time() - age))
+    return lock_path
+
+
+def test_a_lock_left_by_a_dead_process_is_broken(tmp_path):
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    lock_path = write_lock(str(tmp_path), f"{socket.gethostname()} {dead.pid} token")
+
+    BillArchive(str(tmp_path)).append([bill("after")])
+    assert names_in(str(tmp_path)) == ["after"]
+    assert not os.path.exists(lock_path)
+
+
+def test_an_old_lock_from_another_machine_is_broken(tmp_path):
+    write_lock(str(tmp_path), "elsewhere 123 token", age=bill_archive.LOCK_STALE + 5)
+    BillArchive(str(tmp_path)).append([bill("after")])
+    assert names_in(str(tmp_path)) == ["after"]
+
+
+def test_a_live_writer_keeps_its_lock_past_lock_stale(tmp_path, monkeypatch):
+    monkeypatch.setattr(bill_archive, "LOCK_TIMEOUT", 0.2)
+    owner = f"{socket.gethostname()} {os.getpid()} token"
+    lock_path = write_lock(str(tmp_path), owner, age=bill_archive.LOCK_STALE + 5)
+
+    with pytest.raises(TimeoutError):
+        BillArchive(str(tmp_path)).append([bill("blocked")])
+    with open(lock_path, encoding="utf-8") as file:
+        assert file.read() == owner
+    assert len(BillArchive(str(tmp_path))) == 0
+    assert sorted(os.listdir(tmp_path)) == [LOCK_FILE]
@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bill_cache import content_hash, memoize
+
+
+def test_long_series_hash_every_value():
+    # pandas truncates the repr past 60 rows, so a repr-based key would collide
+    left = pd.Series(np.zeros(100))
+    right = left.copy()
+    right[50] = 1
+    assert content_hash(left) != content_hash(right)
+    assert content_hash(left) == content_hash(left.copy())
+    assert content_hash(left) != content_hash(left.rename("Paid"))
+
+
+def test_index_hash_by_values():
+    assert content_hash(pd.Index(range(100))) == content_hash(pd.Index(range(100)))
+    assert content_hash(pd.Index(range(100))) != content_hash(pd.Index([*range(99), 0]))
+
+
+def test_object_arrays_hash_by_elements_not_pointers():
+    names = np.array(["Alice", "Bob"], dtype=object)
+    assert content_hash(names) == content_hash(np.array(["Alice", "Bob"], dtype=object))
+    assert content_hash(names) != content_hash(np.array(["Alice", "Bea"], dtype=object))
+
+
+def test_unknown_types_cannot_be_hashed():
+    with pytest.raises(TypeError):
+        content_hash(Decimal("1.50"))
+
+
+def test_unhashable_arguments_run_uncached():
+    calls = []
+
+    @memoize(name="test_unhashable_arguments_run_uncached")
+    def total(prices):
+        calls.append(prices)
+        return sum(prices)
+
+    assert total([Decimal("1.50"), Decimal("2.25")]) == Decimal("3.75")
+    assert total([Decimal("1.50"), Decimal("2.25")]) == Decimal("3.75")
+    assert len(calls) == 2
+    assert total.cache.stats()["size"] == 0
+
+    assert total([1.5, 2.25]) == total([1.5, 2.25])
+    assert len(calls) == 3
+
+
+def test_memoized_series_calls_see_changed_rows():
+    @memoize(name="test_memoized_series_calls_see_changed_rows")
+    def paid_total(paid):
+        return float(paid.sum())
+
+    paid = pd.Series(np.zeros(100))
+    assert paid_total(paid) == 0
+    paid[50] = 25
+    assert paid_total(paid) == 25
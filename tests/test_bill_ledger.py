@@ -0,0 +1,83 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import bill_ledger
+from bill_ledger import BillLedger
+from streamlit_bill import group_ledger_view
+
+NOW = datetime(2026, 10, 1, 12, 0)
+
+DINNER = dict(people=["a", "b", "c"], items=["Pizza", "Tax"], final_prices=[900, 33.33],
+              weights=[[1, 2, 0], [1, 1, 1]], paid_amounts=[933.33, 0, 0])
+TAXI = dict(people=["b", "c"], items=["Taxi"], final_prices=[300], weights=[[1, 2]], paid_amounts=[0, 300])
+LUNCH = dict(people=["a", "d"], items=["Thali"], final_prices=[0.03], weights=[[1, 1]], paid_amounts=[0, 0.03])
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return BillLedger(str(tmp_path / "ledger.sqlite3"))
+
+
+def recomputed(connection):
+    # group_balances as it would be rebuilt from every saved bill
+    rows = connection.execute("""
+        SELECT b.group_name, bp.person, SUM(bp.owed_paise - bp.paid_paise)
+        FROM bill_people bp JOIN bills b ON b.id = bp.bill_id
+        GROUP BY b.group_name, bp.person
+    """).fetchall()
+    return {(group, person): net for group, person, net in rows if net}
+
+
+def stored(connection):
+    rows = connection.execute("SELECT group_name, person, net_paise FROM group_balances").fetchall()
+    return {(group, person): net for group, person, net in rows if net}
+
+
+def test_group_balances_follow_saves_deletes_and_resaves(ledger):
+    ledger.save_bill(**DINNER, group="trip", created=NOW)
+    taxi = ledger.save_bill(**TAXI, group="trip", created=NOW)
+    ledger.save_bill(**LUNCH, created=NOW)
+    assert stored(ledger.connection) == recomputed(ledger.connection)
+
+    ledger.delete_bill(taxi)
+    assert stored(ledger.connection) == recomputed(ledger.connection)
+
+    # The last bill's id is reused once it is deleted; re-saving it must not count it twice
+    lunch = ledger.save_bill(**LUNCH, created=NOW)
+    ledger.delete_bill(lunch)
+    assert ledger.save_bill(**LUNCH, created=NOW) == lunch
+    assert stored(ledger.connection) == recomputed(ledger.connection)
+    # Two lunches of 3 paise: a owes 2 paise for each
+    assert ledger.group_balances("").net_paise().tolist() == [4, -4]
+
+
+def test_group_balances_are_backfilled_for_an_existing_database(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    ledger = BillLedger(path)
+    ledger.save_bill(**DINNER, group="trip", created=NOW)
+    ledger.save_bill(**TAXI, group="trip", created=NOW)
+    expected = recomputed(ledger.connection)
+
+    # A ledger from before group_balances existed
+    with ledger.lock, ledger.connection:
+        ledger.connection.execute("DROP TABLE group_balances")
+    ledger.connection.close()
+    bill_ledger._pool.clear()
+
+    reopened = BillLedger(path)
+    assert stored(reopened.connection) == expected
+    assert stored(sqlite3.connect(path)) == expected
+
+
+def test_the_panel_and_the_settlement_use_the_same_group(ledger, monkeypatch):
+    monkeypatch.setattr(bill_ledger, "datetime", type("frozen", (datetime,), {"now": staticmethod(lambda: NOW)}))
+    ledger.save_bill(**TAXI, group="trip", created=NOW)
+
+    summary, (transactions, _) = group_ledger_view(ledger, "")
+    assert summary.empty and transactions == []
+
+    summary, (transactions, _) = group_ledger_view(ledger, "trip")
+    assert sorted(summary["person"]) == ["b", "c"]
+    assert transactions == [("b", "c", 100.0)]
@@ -0,0 +1,24 @@
+import pandas as pd
+
+from streamlit_bill import generate_detailed_export, iter_detailed_export, preview_detailed_export
+
+PEOPLE = ["Alice", "Bob"]
+ITEMS = ["Pizza", "Tax"]
+WEIGHTS = [[1, 2], [1, 1]]
+ARGS = (
+    ITEMS, [900, 33.33], PEOPLE, [316.67, 616.66], [933.33, 0],
+    [("Bob", "Alice", 616.66)], 933.33,
+    pd.DataFrame({"Person": PEOPLE, **{item: WEIGHTS[i] for i, item in enumerate(ITEMS)}}), WEIGHTS,
+)
+
+
+def test_download_is_the_generated_text_in_utf8():
+    assert generate_detailed_export(*ARGS) == "".join(iter_detailed_export(*ARGS)).encode("utf-8")
+
+
+def test_preview_is_the_start_of_the_export():
+    text = "".join(iter_detailed_export(*ARGS))
+    assert preview_detailed_export(*ARGS) == text
+    preview = preview_detailed_export(*ARGS, limit=100)
+    assert preview.endswith("download the file for the full export\n")
+    assert text.startswith(preview[:preview.index("\n… preview truncated")])
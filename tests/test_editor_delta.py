@@ -0,0 +1,103 @@
+import copy
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import streamlit_bill
+from streamlit_bill import _changed_editor_slots, _editor_slot, sync_split_state
+
+PEOPLE = ["Alice", "Bob", "Charlie"]
+BASE = pd.DataFrame({column: [""] * 4 for column in ["Item", "Price (₹)", *PEOPLE]})
+EMPTY = {"edited_rows": {}, "added_rows": [], "deleted_rows": []}
+
+
+def delta(edited=None, added=None, deleted=None):
+    return {"edited_rows": edited or {}, "added_rows": added or [], "deleted_rows": deleted or []}
+
+
+PIZZA = {"Item": "Pizza", "Price (₹)": 900, "Alice": 1, "Bob": 2}
+TAX = {"Item": "Tax", "Price (₹)": 33.33, "Alice": 1, "Bob": 1, "Charlie": 1}
+CAKE = {"Item": "Cake", "Price (₹)": 100, "Charlie": 1}
+
+# (previous delta, current delta, slots that must be re-split)
+CHANGES = [
+    (EMPTY, delta({0: PIZZA}), [0]),
+    (delta({0: PIZZA}), delta({0: PIZZA, 2: TAX}), [2]),
+    (delta({0: PIZZA}), delta({0: dict(PIZZA, Bob=1)}), [0]),
+    (delta({0: PIZZA}), delta({0: PIZZA}, [CAKE]), [4]),
+    (delta(added=[CAKE]), delta(added=[dict(CAKE, Alice=1)]), [4]),
+    # Deleting an added row shifts the ones after it into its slot
+    (delta(added=[CAKE, TAX, PIZZA]), delta(added=[CAKE, PIZZA]), [5, 6]),
+    (delta({1: TAX}), delta({1: TAX}, deleted=[1]), [1]),
+    (delta({1: TAX}, deleted=[1]), delta({1: TAX}), [1]),
+    (delta({0: PIZZA}), delta({0: PIZZA}), []),
+]
+
+
+@pytest.mark.parametrize("previous, current, expected", CHANGES)
+def test_changed_slots(previous, current, expected):
+    assert _changed_editor_slots(current, previous, len(BASE)) == expected
+
+
+def test_editor_slot_reads_edits_added_and_deleted_rows():
+    current = delta({0: PIZZA}, [CAKE], [1])
+    base_rows = BASE.to_dict("records")
+    assert _editor_slot(current, base_rows, 0)["Bob"] == 2
+    assert _editor_slot(current, base_rows, 1) is None
+    assert _editor_slot(current, base_rows, 2) == base_rows[2]
+    assert _editor_slot(current, base_rows, 4) == CAKE
+    assert _editor_slot(current, base_rows, 5) is None
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(streamlit_bill, "st", SimpleNamespace(session_state={}))
+    return streamlit_bill.st.session_state
+
+
+def snapshot_after(session, editor_key, current, people=PEOPLE):
+    session[editor_key] = copy.deepcopy(current)
+    return sync_split_state(editor_key, BASE, people).snapshot()
+
+
+def assert_same_split(left, right):
+    (items, prices, weights, result), (expected_items, expected_prices, expected_weights, expected) = left, right
+    assert items == expected_items
+    np.testing.assert_allclose(prices, expected_prices)
+    np.testing.assert_array_equal(np.reshape(weights, (-1, len(PEOPLE))), np.reshape(expected_weights, (-1, len(PEOPLE))))
+    np.testing.assert_array_equal(result.splits, expected.splits)
+    np.testing.assert_array_equal(result.person_totals, expected.person_totals)
+
+
+def test_incremental_split_matches_a_fresh_split_after_every_edit(session):
+    steps = [
+        delta({0: PIZZA}),
+        delta({0: PIZZA, 1: TAX}),
+        delta({0: PIZZA, 1: TAX}, [CAKE, dict(TAX, Item="Tip")]),
+        delta({0: PIZZA, 1: TAX}, [dict(TAX, Item="Tip")]),
+        delta({0: PIZZA, 1: TAX}, [dict(TAX, Item="Tip")], [0]),
+        delta({0: dict(PIZZA, Item=""), 1: TAX}, [dict(TAX, Item="Tip")]),
+        delta({1: dict(TAX, Charlie=0)}, [dict(TAX, Item="Tip", Bob=None)]),
+    ]
+    for step, current in enumerate(steps):
+        incremental = snapshot_after(session, "matrix", current)
+        fresh = snapshot_after(session, f"fresh_{step}", current)
+        assert_same_split(incremental, fresh)
+
+
+def test_totals_follow_edits_and_deletes(session):
+    items, _, _, result = snapshot_after(session, "matrix", delta({0: PIZZA}, [TAX]))
+    assert items == ["Pizza", "Tax"]
+    np.testing.assert_array_equal(result.person_totals, [30000 + 1111, 60000 + 1111, 1111])
+
+    items, _, _, result = snapshot_after(session, "matrix", delta({0: PIZZA}, [TAX], [0]))
+    assert items == ["Tax"]
+    np.testing.assert_array_equal(result.person_totals, [1111, 1111, 1111])
+
+
+def test_new_people_start_a_fresh_split(session):
+    snapshot_after(session, "matrix", delta({0: PIZZA}))
+    *_, result = snapshot_after(session, "matrix", delta({0: PIZZA}), ["Alice", "Bea", "Charlie"])
+    np.testing.assert_array_equal(result.person_totals, [90000, 0, 0])
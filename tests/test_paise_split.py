@@ -0,0 +1,50 @@
+import numpy as np
+
+from bill_engine import batch_split, compute_split, split_matrix_paise, to_paise
+
+
+def test_every_item_sums_exactly_to_its_price():
+    prices = to_paise([100.00, 0.01, 333.33, 0.02])
+    weights = [[1, 1, 1], [1, 1, 1], [1, 2, 3], [3, 0, 7]]
+    splits = split_matrix_paise(prices, weights)
+    assert splits.dtype == np.int64
+    np.testing.assert_array_equal(splits.sum(axis=1), prices)
+
+
+def test_leftover_paise_go_to_the_largest_remainders():
+    # 1000 paise at 1:2:4 is 142.86, 285.71, 571.43; the two leftover paise go to .86 and .71
+    np.testing.assert_array_equal(split_matrix_paise([1000], [[1, 2, 4]]), [[143, 286, 571]])
+
+
+def test_ties_go_to_the_earlier_person():
+    np.testing.assert_array_equal(split_matrix_paise([100], [[1, 1, 1]]), [[34, 33, 33]])
+    np.testing.assert_array_equal(split_matrix_paise([200], [[0, 1, 1, 1]]), [[0, 67, 67, 66]])
+
+
+def test_one_paisa_goes_to_exactly_one_person():
+    np.testing.assert_array_equal(split_matrix_paise([1], [[1, 1, 1]]), [[1, 0, 0]])
+    np.testing.assert_array_equal(split_matrix_paise([1], [[1, 3]]), [[0, 1]])
+
+
+def test_unshared_and_free_items_split_to_zero():
+    np.testing.assert_array_equal(split_matrix_paise([500, 0], [[0, 0], [1, 1]]), [[0, 0], [0, 0]])
+
+
+def test_batch_dimensions_split_like_single_bills():
+    prices = to_paise([[100, 0.01], [10, 20]])
+    weights = np.array([[[1, 1, 1], [1, 1, 0]], [[1, 2, 0], [0, 0, 0]]], dtype=float)
+    batched = split_matrix_paise(prices, weights)
+    for bill_idx in range(2):
+        np.testing.assert_array_equal(batched[bill_idx], split_matrix_paise(prices[bill_idx], weights[bill_idx]))
+
+
+def test_paise_mode_person_totals_add_up_to_the_bill():
+    result = compute_split([33.33, 10, 0.05], [[1, 1, 1], [1, 2, 0], [1, 1, 1]], mode="paise")
+    assert result.person_totals.sum() == 4338
+    np.testing.assert_array_equal(result.item_totals, [3333, 1000, 5])
+
+
+def test_batch_split_paise_mode_matches_compute_split():
+    bills = [([33.33], [[1, 1, 1]]), ([0.01, 5], [[1, 1], [2, 1]])]
+    for (prices, weights), result in zip(bills, batch_split(bills, mode="paise").bills):
+        np.testing.assert_array_equal(result["splits"], compute_split(prices, weights, mode="paise").splits)
@@ -0,0 +1,85 @@
+import numpy as np
+
+from settlement import (
+    GroupBalances, _max_zero_sum_groups, _zero_sum_groups, calculate_optimal_settlement,
+    calculate_settlement_transactions, iter_settlement_transactions,
+)
+
+
+def bill_for(net_rupees):
+    # Everyone paid 100 and owes 100 plus their net (positive = owes money)
+    people = [f"p{i}" for i in range(len(net_rupees))]
+    paid = [100.0] * len(net_rupees)
+    return people, paid, [100.0 + net for net in net_rupees]
+
+
+def remaining(people, net_rupees, transactions):
+    left = {person: round(net * 100) for person, net in zip(people, net_rupees)}
+    for from_person, to_person, amount in transactions:
+        left[from_person] -= round(amount * 100)
+        left[to_person] += round(amount * 100)
+    return left
+
+
+def test_zero_sum_subgroups_save_transfers_over_greedy():
+    # Greedy needs 4 transfers; {+3, -3} and {+7, -5, -2} settle in 1 + 2
+    net = [7, 3, -5, -3, -2]
+    people, paid, totals = bill_for(net)
+    transactions, proven_optimal = calculate_optimal_settlement(people, paid, totals)
+
+    assert proven_optimal
+    assert len(calculate_settlement_transactions(people, paid, totals)) == 4
+    assert len(transactions) == 3
+    assert not any(remaining(people, net, transactions).values())
+
+
+def test_matching_pairs_settle_one_to_one():
+    net = [2.5, -1, 1, -2.5]
+    people, paid, totals = bill_for(net)
+    transactions, _ = calculate_optimal_settlement(people, paid, totals)
+    assert sorted(transactions) == [("p0", "p3", 2.5), ("p2", "p1", 1.0)]
+
+
+def test_zero_sum_decomposition_partitions_the_balances():
+    balances = np.array([700, 300, -500, -300, -200])
+    best, is_zero = _max_zero_sum_groups(balances, None)
+    groups = _zero_sum_groups(best, is_zero, len(balances))
+
+    assert best[-1] == 2
+    assert sorted(i for group in groups for i in group) == [0, 1, 2, 3, 4]
+    assert sorted(sorted(group) for group in groups) == [[0, 2, 4], [1, 3]]
+
+
+def test_nothing_to_settle():
+    assert calculate_optimal_settlement(["a", "b"], [50, 50], [50, 50]) == ([], True)
+
+
+def test_large_groups_fall_back_to_greedy():
+    net = [1.0] * 15 + [-1.5] * 10
+    people, paid, totals = bill_for(net)
+    transactions, _ = calculate_optimal_settlement(people, paid, totals, max_people=20)
+    assert transactions == list(iter_settlement_transactions(people, paid, totals))
+    assert not any(remaining(people, net, transactions).values())
+
+
+def test_one_paisa_balances_are_settled():
+    transactions, proven_optimal = calculate_optimal_settlement(["a", "b"], [266.67, 266.66], [266.66, 266.67])
+    assert transactions == [("b", "a", 0.01)]
+    assert proven_optimal
+
+
+def test_one_paisa_balances_are_settled_by_the_greedy_fallback():
+    net = [0.01] * 12 + [-0.02] * 6 + [0.01, -0.01] * 2
+    people, paid, totals = bill_for(net)
+    transactions, _ = calculate_optimal_settlement(people, paid, totals, max_people=20)
+    assert len(transactions) == 12 + 2
+    assert not any(remaining(people, net, transactions).values())
+
+
+def test_group_settlement_keeps_one_paisa_balances():
+    group = GroupBalances()
+    group.add_bill(1, ["a", "b"], [266.67, 266.66], [266.66, 266.67])
+    group.add_bill(2, ["b", "c"], [0, 0.01], [0.01, 0])
+    transactions, proven_optimal = group.settle()
+    assert sorted(transactions) == [("b", "a", 0.01), ("b", "c", 0.01)]
+    assert proven_optimal
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from bill_engine import as_sparse_weights, as_weight_matrix, compute_split, split_sparse, values_at
+
+PRICES = [10.00, 1.00, 0.01, 500, 0]
+WEIGHTS = [[1, 2, 4, 0], [1, 1, 1, 0], [0, 1, 1, 1], [0, 0, 0, 0], [1, 0, 0, 1]]
+
+
+def test_as_sparse_weights_drops_zeros_in_item_major_order():
+    sparse = as_sparse_weights(WEIGHTS)
+    assert sparse.shape == (5, 4)
+    np.testing.assert_array_equal(sparse.items, [0, 0, 0, 1, 1, 1, 2, 2, 2, 4, 4])
+    np.testing.assert_array_equal(sparse.people, [0, 1, 2, 0, 1, 2, 1, 2, 3, 0, 3])
+    np.testing.assert_array_equal(as_weight_matrix(sparse, 5, 4), WEIGHTS)
+
+
+def test_scipy_matrices_convert_like_dense_weights():
+    from_scipy = as_sparse_weights(sp.csr_matrix(np.array(WEIGHTS, dtype=float)))
+    dense = as_sparse_weights(WEIGHTS)
+    for field in ("items", "people", "values"):
+        np.testing.assert_array_equal(getattr(from_scipy, field), getattr(dense, field))
+
+
+@pytest.mark.parametrize("mode", ["float", "paise"])
+def test_sparse_split_matches_dense(mode):
+    sparse = compute_split(PRICES, as_sparse_weights(WEIGHTS), mode=mode)
+    dense = compute_split(PRICES, WEIGHTS, mode=mode)
+    np.testing.assert_array_equal(as_weight_matrix(sparse.splits, 5, 4), dense.splits)
+    np.testing.assert_array_equal(sparse.person_totals, dense.person_totals)
+    np.testing.assert_array_equal(sparse.item_totals, dense.item_totals)
+
+
+def test_sparse_paise_ties_and_remainders():
+    shares = split_sparse(PRICES, as_sparse_weights(WEIGHTS), mode="paise")
+    assert shares.values.dtype == np.int64
+    # 1:2:4 of 1000 paise, 100 paise three ways, one paisa three ways, then an even split of nothing
+    np.testing.assert_array_equal(shares.values, [143, 286, 571, 34, 33, 33, 1, 0, 0, 0, 0])
+
+
+def test_values_at_reads_dense_and_sparse_matrices():
+    entries = as_sparse_weights([[0, 1], [1, 0]])
+    np.testing.assert_array_equal(values_at(np.array([[5, 6], [7, 8]]), entries), [6, 7])
+    np.testing.assert_array_equal(values_at(as_sparse_weights([[0, 6], [0, 0]]), entries), [6, 0])